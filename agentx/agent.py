@@ -7,9 +7,11 @@ from __future__ import (
 )
 
 import time
+import signal
+import asyncio
 import logging
+import concurrent.futures
 import agentx
-from agentx.dataset import DataSet
 from agentx.network import Network
 
 
@@ -23,8 +25,6 @@ class Agent(object):
         self.logger = logging.getLogger("agentx.agent")
         self.logger.addHandler(NullHandler())
 
-        self._servingset = DataSet()
-        self._workingset = DataSet()
         self._lastupdate = 0
         self._update_period = period  # Seconds
 
@@ -36,48 +36,110 @@ class Agent(object):
 
         self._oid_list = []
         self._args = args
-
-    def _update(self):
+        self._reload = False
+        self._wakeup = None
+        # Updates and reloads run one at a time in this worker thread, so that
+        # AgentX requests keep being served on the event loop meanwhile
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def _sighup(self):
+        # Only flag the reload here, the updater calls reload() in the worker
+        self._reload = True
+        self._wakeup.set()
+
+    def _build(self):
+        # Runs in the worker thread: collect a new dataset, and prepare it for
+        # serving, so that the event loop only has to swap it in
         ds = self.update()
         if not ds:
+            return None
+        return self._net.prepare(ds._data)
+
+    async def _update(self):
+        loop = asyncio.get_running_loop()
+        if self._reload:
+            self._reload = False
+            self.logger.info("Reloading on SIGHUP")
+            await loop.run_in_executor(self._executor, self.reload)
+
+        prepared = await loop.run_in_executor(self._executor, self._build)
+        if not prepared:
             return False
 
-        self._net.update(ds._data)
+        self._net.swap(prepared)
         self._lastupdate = time.time()
         return True
 
-    def run(self):
-        self.logger.info("Calling setup")
-        if not self.setup():
-            self.logger.error("Setup failed - exiting")
-            return
-
-        self.logger.info("Initial update")
-        self._update()
+    async def _updater(self, success):
+        while True:
+            if success:
+                timeout = self._update_period
+            else:
+                self.logger.warning(
+                    "Update failed, last successful update was %s" % self._lastupdate
+                )
+                timeout = 1
+            # Sleep until the next update is due, or a SIGHUP wakes us up
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            success = await self._update()
 
+    def _readable(self, fd, closed):
+        try:
+            self._net.process()
+        except Exception as e:
+            self.logger.error("Disconnecting due to exception: %s" % e)
+            asyncio.get_running_loop().remove_reader(fd)
+            self._net.disconnect()
+            closed.set_result(True)
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
         while True:
             if not self._net.is_connected():
                 self.logger.info("Opening AgentX connection")
-                self._net.start(self._oid_list)
+                try:
+                    self._net.start(self._oid_list)
+                    if self._net.is_connected():
+                        self._net.process_buffered()
+                except Exception as e:
+                    self.logger.error("Disconnecting due to exception: %s" % e)
+                    self._net.disconnect()
+            if not self._net.is_connected():
+                await asyncio.sleep(1)
+                continue
 
-            if time.time() - self._lastupdate > self._update_period:
-                if not self._update():
-                    self.logger.warning(
-                        "Update failed, last successful update was %s"
-                        % self._lastupdate
-                    )
-                    time.sleep(1)
+            # Serve requests as they arrive, until the connection is lost
+            closed = loop.create_future()
+            fd = self._net.socket.fileno()
+            loop.add_reader(fd, self._readable, fd, closed)
+            await closed
+            await asyncio.sleep(1)
 
-            try:
-                self._net.run()
-            except Exception as e:
-                self.logger.error("Disconnecting due to exception: %s" % e)
-                self._net.disconnect()
-                time.sleep(1)
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        loop.add_signal_handler(signal.SIGHUP, self._sighup)
+
+        self.logger.info("Initial update")
+        success = await self._update()
+        await asyncio.gather(self._serve(), self._updater(success))
+
+    def run(self):
+        self.logger.info("Calling setup")
+        if not self.setup():
+            self.logger.error("Setup failed - exiting")
+            return
+
+        asyncio.run(self._main())
 
     def stop(self):
         self.logger.debug("Stopping")
         self._net.disconnect()
+        self._executor.shutdown(wait=False)
         pass
 
     def setup(self):
@@ -88,6 +150,10 @@ class Agent(object):
         # Override this
         pass
 
+    def reload(self):
+        # Override this
+        pass
+
     def register(self, oid_list):
         if not isinstance(oid_list, list):
             oid_list = [oid_list]
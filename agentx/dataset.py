@@ -42,3 +42,4 @@ class DataSet:
             return
 
         self._data[oid] = {"name": oid, "type": t, "value": value}
+        return self._data[oid]
@@ -7,10 +7,13 @@ from __future__ import (
 )
 
 import socket
+import struct
 import time
+import bisect
+import heapq
 import logging
 import agentx
-from agentx.pdu import PDU
+from agentx.pdu import PDU, HEADER, VARBIND_HEADER, varbind_header_size
 
 
 class NullHandler(logging.Handler):
@@ -26,6 +29,42 @@ class NetworkError(Exception):
     pass
 
 
+# PDUs are framed by the payload_length at the end of their 20 byte header, in
+# the byte order given by the NETWORK_BYTE_ORDER flag
+PAYLOAD_LENGTH = {True: struct.Struct("!L"), False: struct.Struct("<L")}
+MAX_PDU_SIZE = 1 << 20
+RECV_SIZE = 65536
+
+
+def oid_tuple(oid):
+    if not isinstance(oid, str):
+        return tuple(oid)
+    return tuple(int(part) for part in oid.split(".") if part)
+
+
+# Walk cursors remembered per dataset generation, see ServingSet
+MAX_CURSORS = 1024
+
+
+class ServingSet:
+    # Everything needed to serve one dataset: its OIDs sorted both as int
+    # tuples (for bisecting) and as strings, and their encoded varbinds.
+    # Network swaps a whole ServingSet in at once, and numbers them.
+    def __init__(self, keys=None, oids=None, lookup=None, encoded=None, values=None):
+        self.generation = 0
+        self.keys = keys if keys is not None else []
+        self.oids = oids if oids is not None else []
+        # The OIDs by int tuple, for exact matches without bisecting
+        self.lookup = lookup if lookup is not None else {}
+        self.encoded = encoded if encoded is not None else {}
+        # The values that the pre-encoded varbinds in encoded were encoded from
+        self.values = values if values is not None else {}
+        # Walk cursors: the index in keys of OIDs recently returned by GETNEXT
+        # and GETBULK, so that the next step of a walk needs no bisect. They
+        # are only valid for this generation, and go away with it.
+        self.cursors = {}
+
+
 class Network:
     def __init__(self, server_address="/var/agentx/master", debug=False):
 
@@ -33,11 +72,13 @@ class Network:
         self.transaction_id = 0
         self.debug = debug
         # Data Related Variables
-        self.data = {}
-        self.data_idx = []
+        self.serving = ServingSet()
+        self.generation = 0
+        self._encoder = PDU()
         self._connected = False
         self._server_address = server_address
         self._timeout = 0.1  # Seconds
+        self._recv_buf = bytearray()
 
     def connect(self):
         if self._connected:
@@ -53,6 +94,7 @@ class Network:
 
                 self.socket.connect((host, int(port)))
             self.socket.settimeout(self._timeout)
+            self._recv_buf = bytearray()
             self._connected = True
             logger.info("Connected to %s" % self._server_address)
         except socket.error:
@@ -68,18 +110,113 @@ class Network:
         self._connected = False
         return
 
-    def update(self, newdata):
-        if len(self.data) == 0:
-            logger.info("Setting initial serving dataset (%d OIDs)" % len(newdata))
+    def prepare(self, newdata):
+        # Build a ServingSet for newdata, without touching the one being served,
+        # so that this can run outside of the serving thread. newdata is not
+        # copied: only the varbinds of values that are read on demand are used
+        # after this returns.
+        keys, oids, lookup = self._index(newdata)
+
+        # Encode every varbind once per dataset. An OID that is already being
+        # served keeps its encoded type and OID, and its whole varbind if the
+        # value did not change either, so mostly only counters are encoded.
+        # Values that are callables are read on demand, so for those only the
+        # type and OID are encoded here.
+        encoder = PDU()
+        serving_encoded = self.serving.encoded
+        serving_values = self.serving.values
+        encoded = {}
+        values = {}
+        for oid, item in newdata.items():
+            oid_type = item["type"]
+            value = item["value"]
+            header = None
+            cached = serving_encoded.get(oid)
+            if cached is not None:
+                if not isinstance(cached, bytes):
+                    cached = cached[0]
+                if VARBIND_HEADER.unpack_from(cached)[0] == oid_type:
+                    if oid in serving_values and serving_values[oid] == value:
+                        encoded[oid] = cached
+                        values[oid] = value
+                        continue
+                    header = cached[: varbind_header_size(cached)]
+            if header is None:
+                header = encoder.encode_varbind_header(oid_type, item["name"])
+            if not callable(value):
+                try:
+                    encoded[oid] = header + encoder.encode_data(oid_type, value)
+                    values[oid] = value
+                    continue
+                except Exception as e:
+                    logger.warning("Can't encode %s: %s" % (oid, e))
+            encoded[oid] = (header, item)
+        return ServingSet(keys, oids, lookup, encoded, values)
+
+    def _index(self, newdata):
+        # The sorted index of newdata, derived from that of the serving set, so
+        # that only OIDs which were added or removed since cost anything
+        serving = self.serving
+        removed = set(oid for oid in serving.oids if oid not in newdata)
+        kept = len(serving.oids) - len(removed)
+        if len(newdata) == kept and not removed:
+            # Same OIDs as the serving set, so its sorted index can be reused
+            return serving.keys, serving.oids, serving.lookup
+
+        added = []
+        if len(newdata) > kept:
+            added = sorted(
+                (oid_tuple(oid), oid) for oid in newdata if oid not in serving.encoded
+            )
+        pairs = zip(serving.keys, serving.oids)
+        if removed:
+            pairs = ((key, oid) for key, oid in pairs if oid not in removed)
+        keys = []
+        oids = []
+        for key, oid in heapq.merge(pairs, added):
+            keys.append(key)
+            oids.append(oid)
+        lookup = serving.lookup.copy()
+        for oid in removed:
+            del lookup[oid_tuple(oid)]
+        lookup.update(added)
+        logger.debug(
+            "Index updated: %d OIDs added, %d removed" % (len(added), len(removed))
+        )
+        return keys, oids, lookup
+
+    def swap(self, prepared):
+        # Start serving a ServingSet returned by prepare()
+        self.generation += 1
+        prepared.generation = self.generation
+        if prepared.keys is self.serving.keys:
+            logger.info(
+                "Swapping in dataset generation %d (%d OIDs, index unchanged)"
+                % (prepared.generation, len(prepared.oids))
+            )
         else:
-            logger.info("Replacing serving dataset (%d OIDs)" % len(newdata))
-        del self.data
-        self.data = newdata.copy()
+            logger.info(
+                "Swapping in dataset generation %d (%d OIDs)"
+                % (prepared.generation, len(prepared.oids))
+            )
+        self.serving = prepared
 
-        del self.data_idx
-        self.data_idx = sorted(
-            self.data.keys(), key=lambda k: tuple(int(part) for part in k.split("."))
-        )
+    def update(self, newdata):
+        self.swap(self.prepare(newdata))
+
+    def _get(self, oid):
+        # The encoded varbind of oid, or None if it is read on demand, and that
+        # read failed
+        encoded = self.serving.encoded[oid]
+        if isinstance(encoded, bytes):
+            return encoded
+        header, item = encoded
+        value = item["value"]
+        if callable(value):
+            value = value()
+            if value is None:
+                return None
+        return header + self._encoder.encode_data(item["type"], value)
 
     def new_pdu(self, type):
         pdu = PDU(type)
@@ -98,47 +235,81 @@ class Network:
     def send_pdu(self, pdu):
         if self.debug:
             pdu.dump()
-        self.socket.send(pdu.encode())
+        self.socket.sendall(pdu.encode())
 
-    def recv_pdu(self):
-        buf = self.socket.recv(100000)
-        if not buf:
+    def _next_frame(self):
+        # The first complete PDU in the receive buffer, or None
+        buf = self._recv_buf
+        if len(buf) < HEADER.size:
             return None
+        length = PAYLOAD_LENGTH[bool(buf[2] & 0x10)].unpack_from(buf, 16)[0]
+        length += HEADER.size
+        if length > MAX_PDU_SIZE:
+            raise NetworkError("PDU of %d bytes is too large" % length)
+        if len(buf) < length:
+            return None
+        frame = bytes(buf[:length])
+        del buf[:length]
+        return frame
+
+    def _decode(self, frame):
         pdu = PDU()
-        pdu.decode(buf)
+        pdu.decode(frame)
         if self.debug:
             pdu.dump()
         return pdu
 
+    def recv_pdu(self):
+        # Read until the receive buffer holds a complete PDU, any data after it
+        # is kept for the next call
+        frame = self._next_frame()
+        while frame is None:
+            buf = self.socket.recv(RECV_SIZE)
+            if not buf:
+                return None
+            self._recv_buf += buf
+            frame = self._next_frame()
+        return self._decode(frame)
+
     # =========================================
 
-    def _get_next_oid(self, oid, endoid):
-        if oid in self.data:
-            # Exact match found
-            # logger.debug('get_next_oid, exact match of %s' % oid)
-            idx = self.data_idx.index(oid)
-            if idx == (len(self.data_idx) - 1):
-                # Last Item in MIB, No match!
-                return None
-            return self.data_idx[idx + 1]
+    def _find_oid(self, oid):
+        return self.serving.lookup.get(oid_tuple(oid))
+
+    def _get_next_oid(self, oid, endoid, include=0):
+        # The first OID after oid (or at oid, if include is set), which must be
+        # before endoid, unless endoid is empty
+        serving = self.serving
+        keys = serving.keys
+        key = oid_tuple(oid)
+        idx = None if include else serving.cursors.get(key)
+        if idx is not None:
+            idx += 1
+        elif include:
+            idx = bisect.bisect_left(keys, key)
         else:
-            # No exact match, find prefix
-            # logger.debug('get_next_oid, no exact match of %s' % oid)
-            slist = oid.split(".")
-            elist = endoid.split(".")
-            for tmp_oid in self.data_idx:
-                tlist = tmp_oid.split(".")
-                for i in range(len(tlist)):
-                    try:
-                        sok = int(slist[i]) <= int(tlist[i])
-                        eok = int(elist[i]) >= int(tlist[i])
-                        if not (sok and eok):
-                            break
-                    except IndexError:
-                        pass
-                if sok and eok:
-                    return tmp_oid
-            return None  # No match!
+            idx = bisect.bisect_right(keys, key)
+        if idx == len(keys):
+            # Past the last item in MIB, no match!
+            return None
+        end = oid_tuple(endoid)
+        if end and keys[idx] >= end:
+            return None
+        if len(serving.cursors) >= MAX_CURSORS:
+            serving.cursors.clear()
+        serving.cursors[keys[idx]] = idx
+        return serving.oids[idx]
+
+    def _get_next(self, oid, endoid, include=0):
+        next_oid = self._get_next_oid(oid, endoid, include)
+        logger.debug("GET_NEXT: %s => %s" % (oid, next_oid))
+        while next_oid:
+            value = self._get(next_oid)
+            if value is not None:
+                return next_oid, value
+            # Values that can't be read right now are skipped, like table holes
+            next_oid = self._get_next_oid(next_oid, endoid)
+        return None, {"type": agentx.TYPE_ENDOFMIBVIEW, "name": oid, "value": 0}
 
     def start(self, oid_list):
         self.connect()
@@ -190,20 +361,60 @@ class Network:
             self.disconnect()
             raise NetworkError("Empty PDU, disconnecting")
 
+        self._respond(request)
+
+    def process(self):
+        # Read whatever is available on the socket without waiting for more, and
+        # answer the complete PDUs. Meant to be called when the socket is readable.
+        if not self._connected:
+            raise NetworkError("Not connected")
+
+        buf = self.socket.recv(RECV_SIZE)
+        if not buf:
+            logger.error("Empty PDU, connection closed!")
+            self.disconnect()
+            raise NetworkError("Empty PDU, disconnecting")
+        self._recv_buf += buf
+        self.process_buffered()
+
+    def process_buffered(self):
+        # Answer the complete PDUs in the receive buffer, eg. requests that were
+        # read along with the last response during start()
+        frame = self._next_frame()
+        if frame:
+            self._respond(self._decode(frame))
+
+    def _respond(self, request):
+        # Answer every PDU that is complete in the receive buffer, and send all
+        # responses at once
+        responses = []
+        while request:
+            response = self.handle_pdu(request)
+            if self.debug:
+                response.dump()
+            responses.append(response.encode())
+            frame = self._next_frame()
+            request = self._decode(frame) if frame else None
+        self.socket.sendall(b"".join(responses))
+
+    def handle_pdu(self, request):
         response = self.response_pdu(request)
         if request.type == agentx.AGENTX_GET_PDU:
             logger.debug("Received GET PDU")
             for rvalue in request.range_list:
-                oid = rvalue[0]
-                logger.debug("OID: %s" % (oid))
-                if oid in self.data:
-                    logger.debug("OID Found")
-                    response.values.append(self.data[oid])
+                oid = self._find_oid(rvalue[0])
+                logger.debug("OID: %s => %s" % (rvalue[0], oid))
+                value = self._get(oid) if oid else None
+                if value is not None:
+                    response.values.append(value)
                 else:
-                    logger.debug("OID Not Found!")
                     response.values.append(
                         {
-                            "type": agentx.TYPE_NOSUCHOBJECT,
+                            "type": (
+                                agentx.TYPE_NOSUCHINSTANCE
+                                if oid
+                                else agentx.TYPE_NOSUCHOBJECT
+                            ),
                             "name": rvalue[0],
                             "value": 0,
                         }
@@ -212,20 +423,37 @@ class Network:
         elif request.type == agentx.AGENTX_GETNEXT_PDU:
             logger.debug("Received GET_NEXT PDU")
             for rvalue in request.range_list:
-                oid = self._get_next_oid(rvalue[0], rvalue[1])
-                logger.debug("GET_NEXT: %s => %s" % (rvalue[0], oid))
-                if oid:
-                    response.values.append(self.data[oid])
-                else:
-                    response.values.append(
-                        {
-                            "type": agentx.TYPE_ENDOFMIBVIEW,
-                            "name": rvalue[0],
-                            "value": 0,
-                        }
-                    )
+                response.values.append(self._get_next(*rvalue)[1])
+
+        elif request.type == agentx.AGENTX_GETBULK_PDU:
+            logger.debug(
+                "Received GET_BULK PDU, non_repeaters %d max_repetitions %d"
+                % (request.non_repeaters, request.max_repetitions)
+            )
+            non_repeaters = min(request.non_repeaters, len(request.range_list))
+            for rvalue in request.range_list[:non_repeaters]:
+                response.values.append(self._get_next(*rvalue)[1])
+
+            # Each repetition continues every repeater from its previous result,
+            # until all of them have hit the end of their range.
+            repeaters = request.range_list[non_repeaters:]
+            for repetition in range(request.max_repetitions):
+                if not repeaters:
+                    break
+                ended = True
+                next_repeaters = []
+                for start_oid, end_oid, include in repeaters:
+                    oid, value = self._get_next(start_oid, end_oid, include)
+                    response.values.append(value)
+                    if oid:
+                        ended = False
+                        start_oid = oid
+                    next_repeaters.append((start_oid, end_oid, 0))
+                if ended:
+                    break
+                repeaters = next_repeaters
 
         else:
             logger.warn("Received unsupported PDU %d" % request.type)
 
-        self.send_pdu(response)
+        return response
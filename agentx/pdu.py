@@ -9,6 +9,7 @@ from __future__ import (
 # --------------------------------------------
 import struct
 import pprint
+import functools
 import logging
 import agentx
 
@@ -21,6 +22,135 @@ class NullHandler(logging.Handler):
 logger = logging.getLogger("agentx.pdu")
 logger.addHandler(NullHandler())
 
+# Precompiled structs for the fixed size parts of PDUs, all in network byte order
+HEADER = struct.Struct("!BBBBLLLL")
+OPEN_HEADER = struct.Struct("!BBBB")
+RESPONSE_HEADER = struct.Struct("!LHH")
+BULK_HEADER = struct.Struct("!HH")
+VARBIND_HEADER = struct.Struct("!HH")
+INT32 = struct.Struct("!l")
+UINT32 = struct.Struct("!L")
+UINT64 = struct.Struct("!Q")
+PADDING = [b"", b"\x00", b"\x00\x00", b"\x00\x00\x00"]
+
+
+# An OID header and its sub-identifiers, one struct per number of sub-identifiers
+OID_STRUCTS = {}
+
+
+def oid_struct(n_subid):
+    s = OID_STRUCTS.get(n_subid)
+    if s is None:
+        s = OID_STRUCTS[n_subid] = struct.Struct("!BBBB%dL" % n_subid)
+    return s
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_oid(oid):
+    # The sub-identifiers of a dotted OID string. Responses name the same OIDs
+    # over and over, so they are only split and converted once.
+    return tuple(int(i) for i in oid.strip().split(".") if i)
+
+
+def split_oid(oid):
+    # An OID as its prefix and remaining sub-identifiers, where the prefix is
+    # the fifth sub-identifier of an OID under 1.3.6.1, and 0 otherwise
+    if isinstance(oid, str):
+        oid = parse_oid(oid)
+    if len(oid) > 5 and oid[0] == 1 and oid[1] == 3 and oid[2] == 6 and oid[3] == 1:
+        return oid[4], oid[5:]
+    return 0, oid
+
+
+def oid_size(oid):
+    return 4 + 4 * len(oid[1])
+
+
+def pack_oid_into(buf, offset, oid, include=0):
+    # Pack an OID returned by split_oid(), return the offset after it
+    prefix, sub_ids = oid
+    s = oid_struct(len(sub_ids))
+    s.pack_into(buf, offset, len(sub_ids), prefix, include, 0, *sub_ids)
+    return offset + s.size
+
+
+def octet_size(octet):
+    return 4 + len(octet) + (4 - (len(octet) % 4)) % 4
+
+
+def pack_octet_into(buf, offset, octet):
+    # Pack an octet string, return the offset after it and its padding
+    UINT32.pack_into(buf, offset, len(octet))
+    offset += 4
+    buf[offset : offset + len(octet)] = octet
+    return offset + len(octet) + (4 - (len(octet) % 4)) % 4
+
+
+def prepare_data(type, value):
+    # The value of a varbind in the form that pack_data_into() packs, and its
+    # encoded size
+    if type in (
+        agentx.TYPE_INTEGER,
+        agentx.TYPE_COUNTER32,
+        agentx.TYPE_GAUGE32,
+        agentx.TYPE_TIMETICKS,
+    ):
+        return value, 4
+    elif type == agentx.TYPE_COUNTER64:
+        return value, 8
+    elif type == agentx.TYPE_OBJECTIDENTIFIER:
+        oid = split_oid(value)
+        return oid, oid_size(oid)
+    elif type in (
+        agentx.TYPE_IPADDRESS,
+        agentx.TYPE_OPAQUE,
+        agentx.TYPE_OCTETSTRING,
+    ):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        return value, octet_size(value)
+    elif type in (
+        agentx.TYPE_NULL,
+        agentx.TYPE_NOSUCHOBJECT,
+        agentx.TYPE_NOSUCHINSTANCE,
+        agentx.TYPE_ENDOFMIBVIEW,
+    ):
+        # No data
+        return None, 0
+    logger.error("Unknown Type: %s" % type)
+    return None, 0
+
+
+def pack_data_into(buf, offset, type, data):
+    # Pack data returned by prepare_data(), return the offset after it
+    if type == agentx.TYPE_INTEGER:
+        INT32.pack_into(buf, offset, data)
+        return offset + 4
+    elif type in (
+        agentx.TYPE_COUNTER32,
+        agentx.TYPE_GAUGE32,
+        agentx.TYPE_TIMETICKS,
+    ):
+        UINT32.pack_into(buf, offset, data)
+        return offset + 4
+    elif type == agentx.TYPE_COUNTER64:
+        UINT64.pack_into(buf, offset, data)
+        return offset + 8
+    elif type == agentx.TYPE_OBJECTIDENTIFIER:
+        return pack_oid_into(buf, offset, data)
+    elif type in (
+        agentx.TYPE_IPADDRESS,
+        agentx.TYPE_OPAQUE,
+        agentx.TYPE_OCTETSTRING,
+    ):
+        return pack_octet_into(buf, offset, data)
+    return offset
+
+
+def varbind_header_size(varbind):
+    # The size of the type and OID at the start of an encoded varbind
+    return VARBIND_HEADER.size + 4 + 4 * varbind[VARBIND_HEADER.size]
+
 
 class PDU(object):
     def __init__(self, type=0):
@@ -30,7 +160,9 @@ class PDU(object):
         self.packet_id = 0
         self.error = agentx.ERROR_NOAGENTXERROR
         self.error_index = 0
-        self.decode_buf = ""
+        self.decode_buf = memoryview(b"")
+        self.decode_offset = 0
+        self.decode_end = 0
         self.state = {}
         self.values = []
 
@@ -52,205 +184,246 @@ class PDU(object):
 
     # ====================================================
     # encode functions
+    #
+    # encode() sizes the whole PDU first, and then packs every part into one
+    # preallocated buffer at its offset with pack_into. The other encode_*
+    # functions return the parts as bytes, eg. to pre-encode varbinds.
 
     def encode_oid(self, oid, include=0):
-        oid = oid.strip()
-        oid = oid.split(".")
-        oid = [int(i) for i in oid]
-        if len(oid) > 5 and oid[:4] == [1, 3, 6, 1]:
-            # prefix
-            prefix = oid[4]
-            oid = oid[5:]
-        else:
-            # no prefix
-            prefix = 0
-        buf = struct.pack("BBBB", len(oid), prefix, include, 0)
-        for i in range(len(oid)):
-            buf += struct.pack("!L", oid[i])
-        return buf
+        prefix, sub_ids = split_oid(oid)
+        return oid_struct(len(sub_ids)).pack(len(sub_ids), prefix, include, 0, *sub_ids)
 
     def encode_octet(self, octet):
-        octet = octet.encode("utf-8")
-        buf = struct.pack("!L", len(octet))
-        buf += octet
+        if isinstance(octet, str):
+            octet = octet.encode("utf-8")
         padding = (4 - (len(octet) % 4)) % 4
-        buf += chr(0).encode() * padding
-        return buf
+        return UINT32.pack(len(octet)) + octet + PADDING[padding]
 
-    def encode_value(self, type, name, value):
-        buf = struct.pack("!HH", type, 0)
-        buf += self.encode_oid(name)
-        if type in [agentx.TYPE_INTEGER]:
-            buf += struct.pack("!l", value)
-        elif type in [
+    def encode_varbind_header(self, type, name):
+        return VARBIND_HEADER.pack(type, 0) + self.encode_oid(name)
+
+    def encode_data(self, type, value):
+        if type == agentx.TYPE_INTEGER:
+            return INT32.pack(value)
+        elif type in (
             agentx.TYPE_COUNTER32,
             agentx.TYPE_GAUGE32,
             agentx.TYPE_TIMETICKS,
-        ]:
-            buf += struct.pack("!L", value)
-        elif type in [agentx.TYPE_COUNTER64]:
-            buf += struct.pack("!Q", value)
-        elif type in [agentx.TYPE_OBJECTIDENTIFIER]:
-            buf += self.encode_oid(value)
-        elif type in [
+        ):
+            return UINT32.pack(value)
+        elif type == agentx.TYPE_COUNTER64:
+            return UINT64.pack(value)
+        elif type == agentx.TYPE_OBJECTIDENTIFIER:
+            return self.encode_oid(value)
+        elif type in (
             agentx.TYPE_IPADDRESS,
             agentx.TYPE_OPAQUE,
             agentx.TYPE_OCTETSTRING,
-        ]:
-            buf += self.encode_octet(value)
-        elif type in [
+        ):
+            return self.encode_octet(value)
+        elif type in (
             agentx.TYPE_NULL,
             agentx.TYPE_NOSUCHOBJECT,
             agentx.TYPE_NOSUCHINSTANCE,
             agentx.TYPE_ENDOFMIBVIEW,
-        ]:
+        ):
             # No data
-            pass
-        else:
-            logger.error("Unknown Type:" % type)
-        return buf
+            return b""
+        logger.error("Unknown Type: %s" % type)
+        return b""
+
+    def encode_value(self, type, name, value):
+        return self.encode_varbind_header(type, name) + self.encode_data(type, value)
 
     def encode_header(self, pdu_type, payload_length=0, flags=0):
         flags = flags | 0x10  # Bit 5 = all ints in NETWORK_BYTE_ORDER
-        buf = struct.pack("BBBB", 1, pdu_type, flags, 0)
-        buf += struct.pack("!L", self.session_id)  # sessionID
-        buf += struct.pack("!L", self.transaction_id)  # transactionID
-        buf += struct.pack("!L", self.packet_id)  # packetID
-        buf += struct.pack("!L", payload_length)
-        return buf
+        return HEADER.pack(
+            1,
+            pdu_type,
+            flags,
+            0,
+            self.session_id,
+            self.transaction_id,
+            self.packet_id,
+            payload_length,
+        )
 
     def encode(self):
-        buf = b""
+        # First pass: the size of the payload, and every part in the form that
+        # it is packed from
         if self.type == agentx.AGENTX_OPEN_PDU:
-            # timeout
-            buf += struct.pack("!BBBB", 5, 0, 0, 0)
-            # agent OID
-            buf += struct.pack("!L", 0)
-            # Agent Desc
-            buf += self.encode_octet("MyAgent")
-
-        elif self.type == agentx.AGENTX_PING_PDU:
-            # No extra data
-            pass
+            # timeout, agent OID and Agent Desc
+            descr = b"MyAgent"
+            size = OPEN_HEADER.size + UINT32.size + octet_size(descr)
+        elif self.type == agentx.AGENTX_REGISTER_PDU:
+            # Sub Tree
+            oid = split_oid(self.oid)
+            size = OPEN_HEADER.size + oid_size(oid)
+        elif self.type == agentx.AGENTX_RESPONSE_PDU:
+            size = RESPONSE_HEADER.size
+            varbinds = []
+            run = []
+            for value in self.values:
+                if isinstance(value, bytes):
+                    # Pre-encoded varbind. Consecutive ones are joined, and then
+                    # copied into the buffer at once, which is much faster than
+                    # copying them one by one.
+                    run.append(value)
+                    continue
+                if run:
+                    varbinds.append(b"".join(run))
+                    size += len(varbinds[-1])
+                    run = []
+                oid = split_oid(value["name"])
+                data, data_size = prepare_data(value["type"], value["value"])
+                size += VARBIND_HEADER.size + oid_size(oid) + data_size
+                varbinds.append((value["type"], oid, data))
+            if run:
+                varbinds.append(b"".join(run) if len(run) > 1 else run[0])
+                size += len(varbinds[-1])
+        else:
+            # PING has no extra data, other PDU types are unsupported
+            size = 0
+
+        # Second pass: pack everything into the buffer
+        buf = bytearray(HEADER.size + size)
+        HEADER.pack_into(
+            buf,
+            0,
+            1,
+            self.type,
+            0x10,  # Bit 5 = all ints in NETWORK_BYTE_ORDER
+            0,
+            self.session_id,
+            self.transaction_id,
+            self.packet_id,
+            size,
+        )
+        offset = HEADER.size
+        if self.type == agentx.AGENTX_OPEN_PDU:
+            OPEN_HEADER.pack_into(buf, offset, 5, 0, 0, 0)
+            UINT32.pack_into(buf, offset + OPEN_HEADER.size, 0)
+            pack_octet_into(buf, offset + OPEN_HEADER.size + UINT32.size, descr)
 
         elif self.type == agentx.AGENTX_REGISTER_PDU:
             range_subid = 0
             timeout = 5
             priority = 127
-            buf += struct.pack("BBBB", timeout, priority, range_subid, 0)
-            # Sub Tree
-            buf += self.encode_oid(self.oid)
+            OPEN_HEADER.pack_into(buf, offset, timeout, priority, range_subid, 0)
+            pack_oid_into(buf, offset + OPEN_HEADER.size, oid)
 
         elif self.type == agentx.AGENTX_RESPONSE_PDU:
-            buf += struct.pack("!LHH", 0, self.error, self.error_index)
-            for value in self.values:
-                buf += self.encode_value(value["type"], value["name"], value["value"])
-
-        else:
-            # Unsupported PDU type
-            pass
-
-        return self.encode_header(self.type, len(buf)) + buf
+            RESPONSE_HEADER.pack_into(buf, offset, 0, self.error, self.error_index)
+            offset += RESPONSE_HEADER.size
+            for varbind in varbinds:
+                if isinstance(varbind, bytes):
+                    end = offset + len(varbind)
+                    buf[offset:end] = varbind
+                    offset = end
+                    continue
+                type, oid, data = varbind
+                VARBIND_HEADER.pack_into(buf, offset, type, 0)
+                offset = pack_oid_into(buf, offset + VARBIND_HEADER.size, oid)
+                offset = pack_data_into(buf, offset, type, data)
+        return buf
 
     # ====================================================
     # decode functions
+    #
+    # The decoder reads from a memoryview of the received buffer, advancing
+    # decode_offset up to decode_end, so nothing is copied but octet strings.
 
     def set_decode_buf(self, buf):
-        self.decode_buf = buf
+        self.decode_buf = memoryview(buf)
+        self.decode_offset = 0
+        self.decode_end = len(buf)
 
     def decode_oid(self):
         try:
-            t = struct.unpack("!BBBB", self.decode_buf[:4])
-            self.decode_buf = self.decode_buf[4:]
-            ret = {
-                "n_subid": t[0],
-                "prefix": t[1],
-                "include": t[2],
-                "reserved": t[3],
-            }
-            sub_ids = []
-            if ret["prefix"]:
-                sub_ids = [1, 3, 6, 1]
-                sub_ids.append(ret["prefix"])
-            for i in range(ret["n_subid"]):
-                t = struct.unpack("!L", self.decode_buf[:4])
-                self.decode_buf = self.decode_buf[4:]
-                sub_ids.append(t[0])
-            oid = ".".join(str(i) for i in sub_ids)
-            return oid, ret["include"]
+            n_subid = self.decode_buf[self.decode_offset]
+            t = oid_struct(n_subid).unpack_from(self.decode_buf, self.decode_offset)
+            self.decode_offset += 4 + 4 * n_subid
+            if t[1]:
+                # prefix
+                oid = (1, 3, 6, 1, t[1]) + t[4:]
+            else:
+                oid = t[4:]
+            return oid, t[2]
         except Exception as e:
             logger.exception("Invalid packing OID header")
-            logger.debug("%s" % pprint.pformat(self.decode_buf))
+            logger.debug("%s" % pprint.pformat(bytes(self.decode_buf)))
 
     def decode_search_range(self):
         start_oid, include = self.decode_oid()
-        if start_oid == []:
-            return [], [], 0
         end_oid, _ = self.decode_oid()
         return start_oid, end_oid, include
 
     def decode_search_range_list(self):
         range_list = []
-        while len(self.decode_buf):
+        while self.decode_offset < self.decode_end:
             range_list.append(self.decode_search_range())
         return range_list
 
     def decode_octet(self):
         try:
-            t = struct.unpack("!L", self.decode_buf[:4])
-            l = t[0]
-            self.decode_buf = self.decode_buf[4:]
-            padding = 4 - (l % 4)
-            buf = self.decode_buf[:l]
-            self.decode_buf = self.decode_buf[l + padding :]
-            return buf
+            l = UINT32.unpack_from(self.decode_buf, self.decode_offset)[0]
+            start = self.decode_offset + 4
+            if start + l > self.decode_end:
+                raise ValueError("Octet string of %d bytes past end of PDU" % l)
+            padding = (4 - (l % 4)) % 4
+            self.decode_offset = start + l + padding
+            return bytes(self.decode_buf[start : start + l])
         except Exception as e:
             logger.exception("Invalid packing octet header")
 
     def decode_value(self):
         try:
-            vtype, _ = struct.unpack("!HH", self.decode_buf[:4])
-            self.decode_buf = self.decode_buf[4:]
+            vtype, _ = VARBIND_HEADER.unpack_from(self.decode_buf, self.decode_offset)
+            self.decode_offset += 4
         except Exception as e:
             logger.exception("Invalid packing value header")
         oid, _ = self.decode_oid()
-        if vtype in [
+        if vtype in (
             agentx.TYPE_INTEGER,
             agentx.TYPE_COUNTER32,
             agentx.TYPE_GAUGE32,
             agentx.TYPE_TIMETICKS,
-        ]:
-            data = struct.unpack("!L", self.decode_buf[:4])
-            data = data[0]
-            self.decode_buf = self.decode_buf[4:]
-        elif vtype in [agentx.TYPE_COUNTER64]:
-            data = struct.unpack("!Q", self.decode_buf[:8])
-            data = data[0]
-            self.decode_buf = self.decode_buf[8:]
-        elif vtype in [agentx.TYPE_OBJECTIDENTIFIER]:
+        ):
+            data = UINT32.unpack_from(self.decode_buf, self.decode_offset)[0]
+            self.decode_offset += 4
+        elif vtype == agentx.TYPE_COUNTER64:
+            data = UINT64.unpack_from(self.decode_buf, self.decode_offset)[0]
+            self.decode_offset += 8
+        elif vtype == agentx.TYPE_OBJECTIDENTIFIER:
             data, _ = self.decode_oid()
-        elif vtype in [
+        elif vtype in (
             agentx.TYPE_IPADDRESS,
             agentx.TYPE_OPAQUE,
             agentx.TYPE_OCTETSTRING,
-        ]:
+        ):
             data = self.decode_octet()
-        elif vtype in [
+        elif vtype in (
             agentx.TYPE_NULL,
             agentx.TYPE_NOSUCHOBJECT,
             agentx.TYPE_NOSUCHINSTANCE,
             agentx.TYPE_ENDOFMIBVIEW,
-        ]:
+        ):
             # No data
             data = None
         else:
             logger.error("Unknown Type: %s" % vtype)
         return {"type": vtype, "name": oid, "data": data}
 
+    def decode_values(self):
+        values = []
+        while self.decode_offset < self.decode_end:
+            values.append(self.decode_value())
+        return values
+
     def decode_header(self):
         try:
-            t = struct.unpack("!BBBBLLLL", self.decode_buf[:20])
-            self.decode_buf = self.decode_buf[20:]
+            t = HEADER.unpack_from(self.decode_buf, self.decode_offset)
+            self.decode_offset += HEADER.size
             ret = {
                 "version": t[0],
                 "pdu_type": t[1],
@@ -267,22 +440,24 @@ class PDU(object):
             self.session_id = ret["session_id"]
             self.packet_id = ret["packet_id"]
             self.transaction_id = ret["transaction_id"]
-            self.decode_buf = self.decode_buf[: ret["payload_length"]]
+            self.decode_end = min(
+                self.decode_end, self.decode_offset + ret["payload_length"]
+            )
             if ret["flags"] & 0x08:  # content present
                 context = self.decode_octet()
                 logger.debug("Context: %s" % context)
             return ret
         except Exception as e:
             logger.exception("Invalid packing: %d" % len(self.decode_buf))
-            logger.debug("%s" % pprint.pformat(self.decode_buf))
+            logger.debug("%s" % pprint.pformat(bytes(self.decode_buf)))
 
     def decode(self, buf):
         self.set_decode_buf(buf)
         ret = self.decode_header()
         if ret["pdu_type"] == agentx.AGENTX_RESPONSE_PDU:
             # Decode Response Header
-            t = struct.unpack("!LHH", self.decode_buf[:8])
-            self.decode_buf = self.decode_buf[8:]
+            t = RESPONSE_HEADER.unpack_from(self.decode_buf, self.decode_offset)
+            self.decode_offset += RESPONSE_HEADER.size
             self.response = {
                 "sysUpTime": t[0],
                 "error": t[1],
@@ -290,9 +465,7 @@ class PDU(object):
                 "index": t[2],
             }
             # Decode VarBindList
-            self.values = []
-            while len(self.decode_buf):
-                self.values.append(self.decode_value())
+            self.values = self.decode_values()
 
         elif ret["pdu_type"] == agentx.AGENTX_GET_PDU:
             self.range_list = self.decode_search_range_list()
@@ -300,11 +473,16 @@ class PDU(object):
         elif ret["pdu_type"] == agentx.AGENTX_GETNEXT_PDU:
             self.range_list = self.decode_search_range_list()
 
+        elif ret["pdu_type"] == agentx.AGENTX_GETBULK_PDU:
+            t = BULK_HEADER.unpack_from(self.decode_buf, self.decode_offset)
+            self.decode_offset += BULK_HEADER.size
+            self.non_repeaters = t[0]
+            self.max_repetitions = t[1]
+            self.range_list = self.decode_search_range_list()
+
         elif ret["pdu_type"] == agentx.AGENTX_TESTSET_PDU:
             # Decode VarBindList
-            self.values = []
-            while len(self.decode_buf):
-                self.values.append(self.decode_value())
+            self.values = self.decode_values()
         elif ret["pdu_type"] in [
             agentx.AGENTX_COMMITSET_PDU,
             agentx.AGENTX_UNDOSET_PDU,
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the AgentX PDU encoder and decoder, to measure the cost of
+serving requests and responses of different sizes without snmpd or VPP.
+
+For each size, the benchmark reports the throughput of:
+    - encoding responses whose varbinds are plain dicts (as built for GET and
+      GETNEXT errors and on-demand values)
+    - encoding responses whose varbinds were pre-encoded when the dataset was
+      swapped in (as Network serves most values)
+    - decoding GETNEXT requests with that many search ranges, with PDU and with
+      LegacyDecoder, the slicing decoder that PDU used to have
+
+Usage:
+    ./agentx_benchmark.py -n 1 -n 100 -n 1000 -t 1
+"""
+
+import sys
+import time
+import struct
+import agentx
+from agentx.pdu import PDU
+
+try:
+    import argparse
+except ImportError:
+    print("ERROR: install argparse manually: sudo pip install argparse")
+    sys.exit(2)
+
+
+def make_values(count):
+    """Return count varbinds, alternating between the IF-MIB value types"""
+    values = []
+    for i in range(count):
+        idx = 1000 + i // 4
+        if i % 4 == 0:
+            oid = "1.3.6.1.2.1.31.1.1.1.6.%u" % idx
+            values.append({"name": oid, "type": agentx.TYPE_COUNTER64, "value": i})
+        elif i % 4 == 1:
+            oid = "1.3.6.1.2.1.2.2.1.10.%u" % idx
+            values.append({"name": oid, "type": agentx.TYPE_COUNTER32, "value": i})
+        elif i % 4 == 2:
+            oid = "1.3.6.1.2.1.2.2.1.8.%u" % idx
+            values.append({"name": oid, "type": agentx.TYPE_INTEGER, "value": 1})
+        else:
+            oid = "1.3.6.1.2.1.31.1.1.1.18.%u" % idx
+            value = "Cust: Some sub-interface %u" % idx
+            oid_type = agentx.TYPE_OCTETSTRING
+            values.append({"name": oid, "type": oid_type, "value": value})
+    return values
+
+
+class LegacyDecoder:
+    """The previous GETNEXT decoder, which sliced a copy of the remaining buffer
+    off after every field, for comparison"""
+
+    def __init__(self, buf):
+        self.decode_buf = buf
+
+    def decode_oid(self):
+        t = struct.unpack("!BBBB", self.decode_buf[:4])
+        self.decode_buf = self.decode_buf[4:]
+        sub_ids = []
+        if t[1]:
+            sub_ids = [1, 3, 6, 1, t[1]]
+        for i in range(t[0]):
+            sub_ids.append(struct.unpack("!L", self.decode_buf[:4])[0])
+            self.decode_buf = self.decode_buf[4:]
+        return ".".join(str(i) for i in sub_ids), t[2]
+
+    def decode(self):
+        t = struct.unpack("!BBBBLLLL", self.decode_buf[:20])
+        self.decode_buf = self.decode_buf[20 : 20 + t[7]]
+        range_list = []
+        while len(self.decode_buf):
+            start_oid, include = self.decode_oid()
+            end_oid, _ = self.decode_oid()
+            range_list.append((start_oid, end_oid, include))
+        return range_list
+
+
+def make_getnext(count):
+    """Return an encoded GETNEXT request with count search ranges"""
+    encoder = PDU(agentx.AGENTX_GETNEXT_PDU)
+    payload = b""
+    for value in make_values(count):
+        payload += encoder.encode_oid(value["name"]) + encoder.encode_oid("")
+    header = encoder.encode_header(agentx.AGENTX_GETNEXT_PDU, len(payload))
+    return header + payload
+
+
+def measure(function, duration):
+    """Run function repeatedly for about duration seconds, return calls/sec"""
+    calls = 0
+    start = time.monotonic()
+    deadline = start + duration
+    while True:
+        function()
+        calls += 1
+        now = time.monotonic()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def benchmark_encode(count, duration):
+    values = make_values(count)
+    response = PDU(agentx.AGENTX_RESPONSE_PDU)
+    response.values = values
+    size = len(response.encode())
+    rate = measure(response.encode, duration)
+    print(
+        "%-40s %10.0f PDU/s %10.1f MB/s"
+        % ("encode %d dict varbinds" % count, rate, rate * size / 1e6)
+    )
+
+    response.values = [
+        bytes(response.encode_value(v["type"], v["name"], v["value"]))
+        for v in values
+    ]
+    rate = measure(response.encode, duration)
+    print(
+        "%-40s %10.0f PDU/s %10.1f MB/s"
+        % ("encode %d pre-encoded varbinds" % count, rate, rate * size / 1e6)
+    )
+
+
+def benchmark_decode(count, duration):
+    buf = make_getnext(count)
+    rate = measure(lambda: PDU().decode(buf), duration)
+    print(
+        "%-40s %10.0f PDU/s %10.1f MB/s"
+        % ("decode GETNEXT with %d ranges" % count, rate, rate * len(buf) / 1e6)
+    )
+    rate = measure(lambda: LegacyDecoder(buf).decode(), duration)
+    print(
+        "%-40s %10.0f PDU/s %10.1f MB/s"
+        % ("legacy decode GETNEXT with %d ranges" % count, rate, rate * len(buf) / 1e6)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "-n",
+        dest="sizes",
+        type=int,
+        action="append",
+        help="""Number of varbinds per response, repeatable, default 1, 100 and 1000""",
+    )
+    parser.add_argument(
+        "-t",
+        dest="duration",
+        type=float,
+        default=1.0,
+        help="""Seconds to run each benchmark for, default 1.0""",
+    )
+    args = parser.parse_args()
+
+    for count in args.sizes or [1, 100, 1000]:
+        benchmark_encode(count, args.duration)
+        benchmark_decode(count, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from vppstats import VPPStats
+from vppstats import VPPStats, StatsTotalsCache
 from vppapi import VPPApi
+from vpprates import VPPRates
+from vppifindex import VPPIfIndex
 import sys
+import re
+import time
+import fnmatch
+import functools
 import yaml
 import agentx
 
@@ -14,65 +20,137 @@ except ImportError:
     sys.exit(2)
 
 
-def get_phy_by_sw_if_index(ifaces, sw_if_index):
-    try:
-        for k, v in ifaces.items():
-            if v.sw_if_index == sw_if_index:
-                return v
-    except:
-        pass
-    return None
+def get_phy_by_sw_if_index(vpp, sw_if_index):
+    return vpp.iface_by_sw_if_index.get(sw_if_index)
 
 
-def get_lcp_by_host_sw_if_index(lcp, host_sw_if_index):
-    try:
-        for k, v in lcp.items():
-            if v.host_sw_if_index == host_sw_if_index:
-                return v
-    except:
-        pass
-    return None
+def get_lcp_by_host_sw_if_index(vpp, host_sw_if_index):
+    return vpp.lcp_by_host_sw_if_index.get(host_sw_if_index)
 
 
-def get_description_by_ifname(config, name):
-    try:
-        if "interfaces" in config:
-            for ifname, iface in config["interfaces"].items():
-                if ifname == name:
-                    return iface["description"]
-                if "sub-interfaces" in iface:
-                    for sub_id, sub_iface in iface["sub-interfaces"].items():
-                        sub_ifname = "%s.%d" % (ifname, sub_id)
-                        if name == sub_ifname:
-                            return sub_iface["description"]
-        if "loopbacks" in config:
-            for ifname, iface in config["loopbacks"].items():
-                if ifname == name:
-                    return iface["description"]
-        if "taps" in config:
-            for ifname, iface in config["taps"].items():
-                if ifname == name:
-                    return iface["description"]
-        if "vxlan_tunnels" in config:
-            for ifname, iface in config["vxlan_tunnels"].items():
-                if ifname == name:
-                    return iface["description"]
-    except:
-        pass
-    return None
+# The C loader is much faster on large vppcfg files, but is only available when
+# PyYAML was built against libyaml.
+YAMLLoader = getattr(yaml, "CFullLoader", yaml.FullLoader)
+
+
+def get_descriptions(config):
+    descriptions = {}
+    for section in ["interfaces", "loopbacks", "taps", "vxlan_tunnels"]:
+        items = config.get(section) or {}
+        for ifname, iface in items.items():
+            if not isinstance(iface, dict):
+                continue
+            if "description" in iface:
+                descriptions.setdefault(ifname, iface["description"])
+            if section != "interfaces":
+                continue
+            for sub_id, sub_iface in (iface.get("sub-interfaces") or {}).items():
+                if isinstance(sub_iface, dict) and "description" in sub_iface:
+                    sub_ifname = "%s.%d" % (ifname, sub_id)
+                    descriptions.setdefault(sub_ifname, sub_iface["description"])
+    return descriptions
+
+
+def compile_patterns(patterns):
+    # Patterns are globs, or regular expressions when prefixed with "re:"
+    regexes = []
+    for pattern in patterns:
+        if pattern.startswith("re:"):
+            regexes.append(pattern[3:])
+        else:
+            regexes.append("^" + fnmatch.translate(pattern))
+    if not regexes:
+        return None
+    return re.compile("|".join("(?:%s)" % regex for regex in regexes))
+
+
+class InterfaceFilter:
+    def __init__(self, include=(), exclude=()):
+        self.patterns = (tuple(include), tuple(exclude))
+        self.include = compile_patterns(include)
+        self.exclude = compile_patterns(exclude)
+
+    def match(self, ifname):
+        if self.include and not self.include.search(ifname):
+            return False
+        if self.exclude and self.exclude.search(ifname):
+            return False
+        return True
+
+
+# Counter columns of the ifTable and ifXTable, refreshed on every poll. Each is
+# (column OID, type, counter path, field), where field selects the packets (0)
+# or octets (1) of a combined counter, and is None for a simple counter.
+COUNTER_COLUMNS = [
+    ("1.3.6.1.2.1.2.2.1.10", "u32", "/if/rx", 1),
+    ("1.3.6.1.2.1.2.2.1.11", "u32", "/if/rx", 0),
+    ("1.3.6.1.2.1.2.2.1.12", "u32", "/if/rx-multicast", 0),
+    ("1.3.6.1.2.1.2.2.1.13", "u32", "/if/rx-no-buf", None),
+    ("1.3.6.1.2.1.2.2.1.14", "u32", "/if/rx-error", None),
+    ("1.3.6.1.2.1.2.2.1.16", "u32", "/if/tx", 1),
+    ("1.3.6.1.2.1.2.2.1.17", "u32", "/if/tx", 0),
+    ("1.3.6.1.2.1.2.2.1.18", "u32", "/if/tx-multicast", 0),
+    ("1.3.6.1.2.1.2.2.1.19", "u32", "/if/drops", None),
+    ("1.3.6.1.2.1.2.2.1.20", "u32", "/if/tx-error", None),
+    ("1.3.6.1.2.1.31.1.1.1.2", "u32", "/if/rx-multicast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.3", "u32", "/if/rx-broadcast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.4", "u32", "/if/tx-multicast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.5", "u32", "/if/tx-broadcast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.6", "u64", "/if/rx", 1),
+    ("1.3.6.1.2.1.31.1.1.1.7", "u64", "/if/rx", 0),
+    ("1.3.6.1.2.1.31.1.1.1.8", "u64", "/if/rx-multicast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.9", "u64", "/if/rx-broadcast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.10", "u64", "/if/tx", 1),
+    ("1.3.6.1.2.1.31.1.1.1.11", "u64", "/if/tx", 0),
+    ("1.3.6.1.2.1.31.1.1.1.12", "u64", "/if/tx-multicast", 0),
+    ("1.3.6.1.2.1.31.1.1.1.13", "u64", "/if/tx-broadcast", 0),
+]
+COUNTER_PATHS = list(dict.fromkeys(column[2] for column in COUNTER_COLUMNS))
 
 
 class MyAgent(agentx.Agent):
+    def load_config(self):
+        try:
+            with open(self._args.config, "r") as f:
+                self.logger.info("Loading configfile %s" % self._args.config)
+                config = yaml.load(f, Loader=YAMLLoader)
+                self.logger.debug("Config: %s" % config)
+            descriptions = get_descriptions(config)
+        except:
+            self.logger.error("Couldn't read config from %s" % self._args.config)
+            return False
+        # An invalid filter raises re.error to the caller, which must not serve
+        # the interfaces that it was meant to filter out
+        interface_filter = self.get_filter(config)
+
+        self.config = config
+        self.descriptions = descriptions
+        self.interface_filter = interface_filter
+        self.logger.info("Loaded %d interface descriptions" % len(descriptions))
+        return True
+
+    def get_filter(self, config):
+        filters = {}
+        if config and isinstance(config.get("filters"), dict):
+            filters = config["filters"]
+        include = list(filters.get("include") or []) + (self._args.include or [])
+        exclude = list(filters.get("exclude") or []) + (self._args.exclude or [])
+        if include or exclude:
+            self.logger.info(
+                "Interface filters: include %s exclude %s" % (include, exclude)
+            )
+        return InterfaceFilter(include, exclude)
+
     def setup(self):
         self.config = None
-        if self._args.config:
-            try:
-                with open(self._args.config, "r") as f:
-                    self.logger.info("Loading configfile %s" % self._args.config)
-                    self.config = yaml.load(f, Loader=yaml.FullLoader)
-                    self.logger.debug("Config: %s" % self.config)
-            except:
-                self.logger.error("Couldn't read config from %s" % self._args.config)
+        self.descriptions = {}
+        try:
+            self.interface_filter = self.get_filter(None)
+            if self._args.config:
+                self.load_config()
+        except re.error as e:
+            self.logger.error("Invalid interface filter: %s" % e)
+            return False
 
         try:
             self.logger.info("Connecting to VPP Stats Segment")
@@ -89,11 +167,68 @@ class MyAgent(agentx.Agent):
             self.logger.error("Could not connect to VPP API")
             return False
 
+        self.counter_cache = None
+        if self._args.ttl:
+            self.logger.info(
+                "Reading counters on demand, cached for %d ms" % self._args.ttl
+            )
+            self.counter_cache = StatsTotalsCache(self.vppstat, self._args.ttl / 1000)
+
+        self.ifindex = VPPIfIndex(filename=self._args.statefile)
+        self.ifindex.load()
+
         self.register("1.3.6.1.2.1.2.2.1")
         self.register("1.3.6.1.2.1.31.1.1.1")
 
+        self.rates = None
+        if self._args.rates_oid:
+            self.logger.info("Publishing interface rates at %s" % self._args.rates_oid)
+            self.rates = VPPRates(size=int(900 / self._args.period) + 2)
+            self.register(self._args.rates_oid)
+
+        self._static_key = None
+        self._served = None
+        self._ds = None
+        self._counter_slots = []
+        self._rate_slots = []
+        self._alias_slots = []
         return True
 
+    def reload(self):
+        if not self._args.config:
+            return
+        patterns = self.interface_filter.patterns
+        try:
+            loaded = self.load_config()
+        except re.error as e:
+            self.logger.error("Invalid interface filter: %s" % e)
+            loaded = False
+        if not loaded:
+            self.logger.warning("Keeping previous config after failed reload")
+            return
+
+        if self.interface_filter.patterns != patterns:
+            self.logger.info("Interface filters changed, rebuilding on next update")
+            self._static_key = None
+            return
+
+        # Otherwise only ifAlias depends on the config, so rewrite it in place
+        for entry, ifname, lcp_alias in self._alias_slots:
+            entry["value"] = self.get_alias(ifname, lcp_alias)
+        self.logger.info("Updated ifAlias of %d interfaces" % len(self._alias_slots))
+
+    def get_alias(self, ifname, lcp_alias):
+        if lcp_alias:
+            return lcp_alias
+        descr = self.descriptions.get(ifname)
+        if descr:
+            self.logger.debug(
+                "Setting ifAlias of %s to config description '%s'" % (ifname, descr)
+            )
+            return descr
+        self.logger.debug("Setting ifAlias of %s to ifname %s" % (ifname, ifname))
+        return ifname
+
     def update(self):
         try:
             self.vpp.connect()
@@ -104,17 +239,83 @@ class MyAgent(agentx.Agent):
             self.logger.error(f"VPP API: {e}, retrying")
             self.vppstat.disconnect()
             self.vpp.disconnect()
+            if self.rates:
+                self.rates.reset()
+            if self.counter_cache:
+                self.counter_cache.clear()
             return False
 
-        ds = agentx.DataSet()
         ifaces = self.vpp.get_ifaces()
         lcp = self.vpp.get_lcp()
 
+        # In on-demand mode, counters are read when they are requested, and only
+        # the interface names (and the counters for rates) are polled here.
+        paths = ["/if/names"]
+        if not self.counter_cache:
+            paths += COUNTER_PATHS
+        elif self.rates:
+            paths += ["/if/rx", "/if/tx"]
+        # Only the counters of the interfaces that are served are summed, and
+        # given rates. Those are the ones of the last rebuild of the static
+        # columns (all of them if there are no filters), so if it is rebuilt,
+        # the counters are read again for the interfaces served after that.
+        counters = self.read_counters(paths)
+        if not counters:
+            return False
+        ifnames = counters["/if/names"]
+
+        # The static columns only change on interface events (which make VPPApi
+        # fetch its interfaces again), when /if/names changes, or when the
+        # config is reloaded.
+        static_key = (self.vpp.generation, ifnames)
+        if static_key != self._static_key:
+            served = self._served
+            self.update_static(ifnames, ifaces, lcp)
+            self._static_key = static_key
+            if self._served != served and len(paths) > 1:
+                counters = self.read_counters(paths)
+                if not counters:
+                    return False
+                if counters["/if/names"] != ifnames:
+                    self.logger.warning("Interfaces changed while reading counters")
+                    self._static_key = None
+                    return False
+
+        if self.rates:
+            self.rates.add(
+                time.monotonic(),
+                ifnames,
+                counters["/if/rx"],
+                counters["/if/tx"],
+                self._served,
+            )
+        if not self.counter_cache:
+            self.update_counters(counters)
+        self.update_rates()
+        return self._ds
+
+    def read_counters(self, paths):
+        """Read the totals of paths for the interfaces that are served, or
+        return None if the stats segment can't be read"""
+        try:
+            counters = self.vppstat.snapshot(paths, indexes=self._served)
+        except IOError as e:
+            self.logger.error(f"VPP Stats: {e}, metrics {self.vppstat.metrics}")
+            return None
+        self.logger.debug(
+            "Read counters at epoch %d after %d retries, metrics %s"
+            % (counters.epoch, counters.retries, self.vppstat.metrics)
+        )
+        return counters
+
+    def update_static(self, ifnames, ifaces, lcp):
+        """Rebuild the dataset with all static columns, and preallocate slots
+        for the counter columns, which update_counters() refreshes every poll"""
         num_ifaces = len(ifaces)
-        num_vppstat = len(self.vppstat["/if/names"])
+        num_vppstat = len([ifname for ifname in ifnames if ifname])
         num_lcp = len(lcp)
-        self.logger.debug(
-            "Retrieved Interfaces: vppapi=%d vppstat=%d lcp=%d"
+        self.logger.info(
+            "Rebuilding static columns: vppapi=%d vppstat=%d lcp=%d"
             % (num_ifaces, num_vppstat, num_lcp)
         )
 
@@ -124,9 +325,17 @@ class MyAgent(agentx.Agent):
                 % (num_ifaces, num_vppstat)
             )
 
-        for i in range(len(self.vppstat["/if/names"])):
-            ifname = self.vppstat["/if/names"][i]
-            idx = 1000 + i
+        ds = agentx.DataSet()
+        counter_slots = {}
+        rate_slots = []
+        alias_slots = []
+        served = []
+        ifindexes = self.ifindex.assign(ifnames)
+        for i, ifname in enumerate(ifnames):
+            if not ifname or not self.interface_filter.match(ifname):
+                continue
+            served.append(i)
+            idx = ifindexes[i]
 
             ds.set("1.3.6.1.2.1.2.2.1.1.%u" % (idx), "int", idx)
 
@@ -135,9 +344,9 @@ class MyAgent(agentx.Agent):
             try:
                 if self.config and ifname.startswith("tap"):
                     host_sw_if_index = ifaces[ifname].sw_if_index
-                    lip = get_lcp_by_host_sw_if_index(lcp, host_sw_if_index)
+                    lip = get_lcp_by_host_sw_if_index(self.vpp, host_sw_if_index)
                     if lip:
-                        phy = get_phy_by_sw_if_index(ifaces, lip.phy_sw_if_index)
+                        phy = get_phy_by_sw_if_index(self.vpp, lip.phy_sw_if_index)
                         ifName = lip.host_if_name
                         self.logger.debug(
                             "Setting ifName of %s to '%s'" % (ifname, ifName)
@@ -208,121 +417,6 @@ class MyAgent(agentx.Agent):
             ds.set("1.3.6.1.2.1.2.2.1.8.%u" % (idx), "int", oper_status)
 
             ds.set("1.3.6.1.2.1.2.2.1.9.%u" % (idx), "ticks", 0)
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.10.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx"][:, i].sum_octets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.11.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.12.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx-multicast"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.13.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx-no-buf"][:, i].sum() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.14.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx-error"][:, i].sum() % 2 ** 32,
-            )
-
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.16.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx"][:, i].sum_octets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.17.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.18.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx-multicast"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.19.%u" % (idx),
-                "u32",
-                self.vppstat["/if/drops"][:, i].sum() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.2.2.1.20.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx-error"][:, i].sum() % 2 ** 32,
-            )
-
-            ds.set("1.3.6.1.2.1.31.1.1.1.1.%u" % (idx), "str", ifName)
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.2.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx-multicast"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.3.%u" % (idx),
-                "u32",
-                self.vppstat["/if/rx-broadcast"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.4.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx-multicast"][:, i].sum_packets() % 2 ** 32,
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.5.%u" % (idx),
-                "u32",
-                self.vppstat["/if/tx-broadcast"][:, i].sum_packets() % 2 ** 32,
-            )
-
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.6.%u" % (idx),
-                "u64",
-                self.vppstat["/if/rx"][:, i].sum_octets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.7.%u" % (idx),
-                "u64",
-                self.vppstat["/if/rx"][:, i].sum_packets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.8.%u" % (idx),
-                "u64",
-                self.vppstat["/if/rx-multicast"][:, i].sum_packets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.9.%u" % (idx),
-                "u64",
-                self.vppstat["/if/rx-broadcast"][:, i].sum_packets(),
-            )
-
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.10.%u" % (idx),
-                "u64",
-                self.vppstat["/if/tx"][:, i].sum_octets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.11.%u" % (idx),
-                "u64",
-                self.vppstat["/if/tx"][:, i].sum_packets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.12.%u" % (idx),
-                "u64",
-                self.vppstat["/if/tx-multicast"][:, i].sum_packets(),
-            )
-            ds.set(
-                "1.3.6.1.2.1.31.1.1.1.13.%u" % (idx),
-                "u64",
-                self.vppstat["/if/tx-broadcast"][:, i].sum_packets(),
-            )
 
             speed = 0
             if ifname.startswith("loop") or ifname.startswith("tap"):
@@ -340,27 +434,73 @@ class MyAgent(agentx.Agent):
                 "1.3.6.1.2.1.31.1.1.1.17.%u" % (idx), "int", 1
             )  # Hardcode to true(1)
 
-            if self.config and not ifAlias:
-                try:
-                    descr = get_description_by_ifname(self.config, ifname)
-                    if descr:
-                        self.logger.debug(
-                            "Setting ifAlias of %s to config description '%s'"
-                            % (ifname, descr)
-                        )
-                        ifAlias = descr
-                except:
-                    pass
-            if not ifAlias:
-                self.logger.debug(
-                    "Setting ifAlias of %s to ifname %s" % (ifname, ifname)
-                )
-                ifAlias = ifname
-            ds.set("1.3.6.1.2.1.31.1.1.1.18.%u" % (idx), "str", ifAlias)
+            entry = ds.set(
+                "1.3.6.1.2.1.31.1.1.1.18.%u" % (idx),
+                "str",
+                self.get_alias(ifname, ifAlias),
+            )
+            alias_slots.append((entry, ifname, ifAlias))
             ds.set(
                 "1.3.6.1.2.1.31.1.1.1.19.%u" % (idx), "ticks", 0
             )  # Hardcode to Timeticks: (0) 0:00:00.00
-        return ds
+
+            for oid, oid_type, path, field in COUNTER_COLUMNS:
+                modulo = 2**32 if oid_type == "u32" else 2**64
+                if self.counter_cache:
+                    value = functools.partial(self.read_counter, path, field, modulo, i)
+                    ds.set("%s.%u" % (oid, idx), oid_type, value)
+                    continue
+                entry = ds.set("%s.%u" % (oid, idx), oid_type, 0)
+                slots = counter_slots.setdefault((path, field, modulo), [])
+                slots.append((entry, i))
+
+            if self.rates:
+                entries = []
+                for column in range(1, len(self.rates.rates(i)) + 1):
+                    oid = "%s.1.%u.%u" % (self._args.rates_oid, column, idx)
+                    entries.append(ds.set(oid, "u64", 0))
+                rate_slots.append((entries, i))
+
+        self._ds = ds
+        # Without filters, reading whole counter vectors is cheaper than
+        # picking every interface out of them
+        filtered = self.interface_filter.include or self.interface_filter.exclude
+        self._served = served if filtered else None
+        self._counter_slots = list(counter_slots.items())
+        self._rate_slots = rate_slots
+        self._alias_slots = alias_slots
+
+    def update_counters(self, counters):
+        """Write the counters of every interface into their preallocated slots"""
+        for (path, field, modulo), slots in self._counter_slots:
+            values = counters[path]
+            if field is None:
+                for entry, i in slots:
+                    entry["value"] = values[i] % modulo
+            else:
+                for entry, i in slots:
+                    entry["value"] = values[i][field] % modulo
+
+    def update_rates(self):
+        if self.rates:
+            for entries, i in self._rate_slots:
+                for entry, rate in zip(entries, self.rates.rates(i)):
+                    entry["value"] = rate
+
+    def read_counter(self, path, field, modulo, i):
+        """Read one counter on demand, through the TTL cache. This runs while
+        serving a request, so it never waits for the stats segment, nor
+        reconnects to it: if it is busy or disconnected, the last totals read
+        are used. If there are none, return None, which is served as
+        noSuchInstance rather than as a counter reset."""
+        try:
+            values = self.counter_cache.get(path, blocking=False)
+            if field is None:
+                return values[i] % modulo
+            return values[i][field] % modulo
+        except Exception as e:
+            self.logger.warning("Could not read %s[%d]: %s" % (path, i, e))
+            return None
 
 
 def main():
@@ -385,6 +525,37 @@ def main():
         type=str,
         help="""Optional vppcfg YAML configuration file, default empty""",
     )
+    parser.add_argument(
+        "-r",
+        dest="rates_oid",
+        type=str,
+        help="""Optional OID to publish interface rates under, default empty""",
+    )
+    parser.add_argument(
+        "-s",
+        dest="statefile",
+        type=str,
+        help="""Optional file to persist the ifIndex of interfaces in, default empty""",
+    )
+    parser.add_argument(
+        "-i",
+        dest="include",
+        action="append",
+        help="""Only serve interfaces matching this glob (or re:regex), repeatable""",
+    )
+    parser.add_argument(
+        "-x",
+        dest="exclude",
+        action="append",
+        help="""Don't serve interfaces matching this glob (or re:regex), repeatable""",
+    )
+    parser.add_argument(
+        "-t",
+        dest="ttl",
+        type=int,
+        default=0,
+        help="""Read counters on demand, cached for TTL msec, default 0 (disabled)""",
+    )
     parser.add_argument(
         "-d", dest="debug", action="store_true", help="""Enable debug, default False"""
     )
@@ -27,6 +27,12 @@ class VPPApi:
         self.vpp = None
         self.iface_dict = None
         self.lcp_dict = None
+        # Indexes into the caches above, rebuilt whenever they are filled
+        self.iface_by_sw_if_index = {}
+        self.lcp_by_host_sw_if_index = {}
+        self.lcp_by_phy_sw_if_index = {}
+        # Incremented whenever the caches are filled with fresh data from VPP
+        self.generation = 0
 
     def _sw_interface_event(self, event):
         # NOTE(pim): this callback runs in a background thread, so we just clear the
@@ -80,6 +86,9 @@ class VPPApi:
         self.vpp.disconnect()
         self.iface_dict = None
         self.lcp_dict = None
+        self.iface_by_sw_if_index = {}
+        self.lcp_by_host_sw_if_index = {}
+        self.lcp_by_phy_sw_if_index = {}
         self.connected = False
         return True
 
@@ -107,10 +116,14 @@ class VPPApi:
             self.disconnect()
             return ret
 
+        by_sw_if_index = {}
         for iface in iface_list:
             ret[iface.interface_name] = iface
+            by_sw_if_index[iface.sw_if_index] = iface
 
+        self.iface_by_sw_if_index = by_sw_if_index
         self.iface_dict = ret
+        self.generation += 1
         logger.debug(f"Caching interfaces: {ret}")
         return self.iface_dict
 
@@ -136,9 +149,16 @@ class VPPApi:
             logger.error("Can't get LCP list")
             return ret
 
+        by_host_sw_if_index = {}
+        by_phy_sw_if_index = {}
         for lcp in lcp_list[1]:
             ret[lcp.host_if_name] = lcp
+            by_host_sw_if_index[lcp.host_sw_if_index] = lcp
+            by_phy_sw_if_index[lcp.phy_sw_if_index] = lcp
 
+        self.lcp_by_host_sw_if_index = by_host_sw_if_index
+        self.lcp_by_phy_sw_if_index = by_phy_sw_if_index
         self.lcp_dict = ret
+        self.generation += 1
         logger.debug(f"Caching LCPs: {ret}")
         return self.lcp_dict
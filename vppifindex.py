@@ -0,0 +1,141 @@
+"""
+VPPIfIndex allocates the ifIndex of every VPP interface, and keeps it stable
+across interface deletions, recreations and agent restarts, so that an NMS
+does not have to rediscover the whole ifTable when a single interface changes.
+
+An interface keeps the ifIndex it was first given for as long as its name
+exists. A new interface gets 1000 + its sw_if_index, unless another interface
+already holds that ifIndex, in which case it gets the next unused one. The
+mapping is saved as a small JSON file, which is written atomically whenever it
+changes, and read back at startup.
+
+Usage:
+    ifindex = VPPIfIndex(filename="/var/lib/vpp-snmp-agent/ifindex.json")
+    ifindex.load()
+    ifindexes = ifindex.assign(stat['/if/names'])
+    ifindexes[sw_if_index] - the ifIndex of an interface, or None if there is
+                             no interface with that sw_if_index
+"""
+
+import os
+import json
+import logging
+import tempfile
+
+
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+
+logger = logging.getLogger("agentx.vppifindex")
+logger.addHandler(NullHandler())
+
+
+class VPPIfIndex:
+    """Allocator of stable ifIndex values, keyed on interface name"""
+
+    base = 1000
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        # Interface name -> {"sw_if_index": ..., "ifindex": ...}. Interfaces that
+        # no longer exist are kept, so they get their ifIndex back if recreated.
+        self.interfaces = {}
+
+    def load(self):
+        """Read the mapping from the state file, if there is one"""
+        if not self.filename:
+            return False
+        try:
+            with open(self.filename, "r") as f:
+                state = json.load(f)
+            interfaces = {}
+            for name, entry in state["interfaces"].items():
+                interfaces[name] = {
+                    "sw_if_index": int(entry["sw_if_index"]),
+                    "ifindex": int(entry["ifindex"]),
+                }
+        except FileNotFoundError:
+            logger.info("No ifIndex state in %s, starting afresh" % self.filename)
+            return False
+        except Exception as e:
+            logger.error("Couldn't read ifIndex state from %s: %s" % (self.filename, e))
+            return False
+
+        self.interfaces = interfaces
+        logger.info(
+            "Loaded %d ifIndex entries from %s" % (len(interfaces), self.filename)
+        )
+        return True
+
+    def save(self):
+        """Write the mapping to the state file, atomically replacing it"""
+        if not self.filename:
+            return False
+        state = {"version": 1, "interfaces": self.interfaces}
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        try:
+            fd, tmpname = tempfile.mkstemp(dir=dirname, prefix=".ifindex.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(state, f, indent=1, sort_keys=True)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmpname, self.filename)
+            except:
+                os.unlink(tmpname)
+                raise
+        except Exception as e:
+            logger.error("Couldn't write ifIndex state to %s: %s" % (self.filename, e))
+            return False
+        return True
+
+    def assign(self, names):
+        """Return the ifIndex of every interface in names, which is indexed by
+        sw_if_index and holds None for unused slots, and save any changes"""
+        interfaces = self.interfaces
+        changed = False
+        current = set(name for name in names if name)
+        taken = set()
+        ret = [None] * len(names)
+
+        # Interfaces that are already known keep their ifIndex
+        for sw_if_index, name in enumerate(names):
+            entry = interfaces.get(name) if name else None
+            if not entry:
+                continue
+            if entry["sw_if_index"] != sw_if_index:
+                logger.info(
+                    "Interface %s moved from sw_if_index %d to %d, keeping ifIndex %d"
+                    % (name, entry["sw_if_index"], sw_if_index, entry["ifindex"])
+                )
+                entry["sw_if_index"] = sw_if_index
+                changed = True
+            ret[sw_if_index] = entry["ifindex"]
+            taken.add(entry["ifindex"])
+
+        stale = {}
+        for name, entry in interfaces.items():
+            if name not in current:
+                stale[entry["ifindex"]] = name
+
+        for sw_if_index, name in enumerate(names):
+            if not name or name in interfaces:
+                continue
+            ifindex = self.base + sw_if_index
+            if ifindex in taken:
+                ifindex = max(max(taken), max(stale, default=0)) + 1
+            elif ifindex in stale:
+                # The interface that had this ifIndex is gone, give it away
+                logger.info("Forgetting ifIndex %d of %s" % (ifindex, stale[ifindex]))
+                del interfaces[stale.pop(ifindex)]
+            logger.info("Allocating ifIndex %d to interface %s" % (ifindex, name))
+            interfaces[name] = {"sw_if_index": sw_if_index, "ifindex": ifindex}
+            ret[sw_if_index] = ifindex
+            taken.add(ifindex)
+            changed = True
+
+        if changed:
+            self.save()
+        return ret
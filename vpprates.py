@@ -0,0 +1,150 @@
+"""
+VPPRates keeps a ring buffer of the last N interface counter snapshots, and
+derives per-interface bit and packet rates from them, so that rates are
+computed once at the source instead of by every NMS that polls the agent.
+
+Each snapshot is stored as four fixed-width arrays (rx/tx octets and packets),
+indexed by the interface's position in /if/names, which is its sw_if_index.
+
+Usage:
+    rates = VPPRates(size=32)
+    snap = stat.snapshot(['/if/names', '/if/rx', '/if/tx'])
+    rates.add(time.monotonic(), snap['/if/names'], snap['/if/rx'], snap['/if/tx'])
+    rates.rates(i) - returns a tuple of rx bps, tx bps, rx pps, tx pps for the
+                     last interval, followed by the same four for the 1, 5 and
+                     15 minute averages
+
+Counters that go backwards mark a discontinuity (a cleared counter, or VPP
+restarting), as does an interface changing its name. Rates for that interface
+are then computed only from samples taken after the discontinuity. A 64-bit
+counter that wraps is accounted for.
+"""
+
+import array
+
+COUNTER64 = 2**64
+
+
+class VPPRates:
+    """Ring buffer of interface counter snapshots, and rates derived from it"""
+
+    # pylint: disable=too-many-instance-attributes
+    windows = (60, 300, 900)
+
+    def __init__(self, size=32):
+        self.size = max(size, 3)
+        self.reset()
+
+    def reset(self):
+        """Forget all samples, eg. after reconnecting to VPP"""
+        self.times = array.array("d", [0.0] * self.size)
+        self.samples = [None] * self.size
+        self.head = -1
+        self.count = 0
+        self.names = []
+        self.served = set()
+        self.since = array.array("d")
+        self._rates = []
+
+    def _sample(self, age):
+        """Return the ring index of the sample that is age samples old"""
+        return (self.head - age) % self.size
+
+    def add(self, timestamp, names, rx, tx, indexes=None):
+        """Add a snapshot of combined /if/rx and /if/tx (packets, octets) totals,
+        taken at the given (monotonic) timestamp, and recompute rates. If
+        indexes is given, rx and tx hold the totals of only those interfaces
+        (see VPPStats.snapshot()), and only their rates are computed."""
+        if indexes is None:
+            count = min(len(names), len(rx), len(tx))
+            indexes = range(count)
+        else:
+            count = len(names)
+            indexes = [i for i in indexes if i < count and i in rx and i in tx]
+        sample = tuple(array.array("Q", bytes(8 * count)) for i in range(4))
+        rx_octets, tx_octets, rx_packets, tx_packets = sample
+        for i in indexes:
+            rx_packets[i], rx_octets[i] = rx[i]
+            tx_packets[i], tx_octets[i] = tx[i]
+
+        since = self.since
+        if len(since) < count:
+            since.extend([timestamp] * (count - len(since)))
+        del since[count:]
+        previous = self.samples[self.head] if self.count else None
+        served = self.served
+        for i in indexes:
+            if i >= len(self.names) or names[i] != self.names[i] or i not in served:
+                # A new interface, or one that wasn't in the previous sample
+                since[i] = timestamp
+                continue
+            if previous is None or i >= len(previous[0]):
+                continue
+            for cur, prev in zip(sample, previous):
+                if cur[i] < prev[i] and prev[i] < COUNTER64 // 2:
+                    since[i] = timestamp
+                    break
+        self.names = list(names[:count])
+        self.served = set(indexes)
+
+        self.head = (self.head + 1) % self.size
+        self.times[self.head] = timestamp
+        self.samples[self.head] = sample
+        self.count = min(self.count + 1, self.size)
+        self._rates = self._compute(count, indexes)
+
+    def _reference(self, window):
+        """Return the age of the sample whose age in seconds is closest to the
+        window, or of the previous sample if window is 0"""
+        if window == 0 or self.count < 3:
+            return 1
+        now = self.times[self.head]
+        ages = range(1, self.count)
+        return min(ages, key=lambda age: abs(now - self.times[self._sample(age)] - window))
+
+    def _compute(self, count, indexes):
+        """Compute the rates of the interfaces at indexes, for the last interval
+        and for every window. Other interfaces get zero rates."""
+        zero = (0,) * 4 * (1 + len(self.windows))
+        result = [zero] * count
+        if self.count < 2:
+            return result
+        rates = {i: [] for i in indexes}
+        current = self.samples[self.head]
+        for window in (0,) + self.windows:
+            age = self._reference(window)
+            for i in indexes:
+                # Walk forward to the oldest sample after a discontinuity
+                ref = age
+                while ref > 0 and self.times[self._sample(ref)] < self.since[i]:
+                    ref -= 1
+                if ref == 0:
+                    rates[i].extend((0, 0, 0, 0))
+                    continue
+                interval = self.times[self.head] - self.times[self._sample(ref)]
+                reference = self.samples[self._sample(ref)]
+                if interval <= 0 or i >= len(reference[0]):
+                    rates[i].extend((0, 0, 0, 0))
+                    continue
+                rx_octets, tx_octets, rx_packets, tx_packets = (
+                    (cur[i] - prev[i]) % COUNTER64
+                    for cur, prev in zip(current, reference)
+                )
+                rates[i].extend(
+                    (
+                        int(rx_octets * 8 / interval),
+                        int(tx_octets * 8 / interval),
+                        int(rx_packets / interval),
+                        int(tx_packets / interval),
+                    )
+                )
+        for i, rate in rates.items():
+            result[i] = tuple(rate)
+        return result
+
+    def rates(self, index):
+        """Return the rates of the interface at index in /if/names"""
+        try:
+            return self._rates[index]
+        except IndexError:
+            return (0,) * 4 * (1 + len(self.windows))
@@ -13,6 +13,20 @@ stat['/if/rx'][:, 1].sum_packets() - returns the sum of packet counters for
                                      interface 1 on all threads
 stat['/if/rx-miss'][:, 1].sum() - returns the sum of packet counters for
                                   interface 1 on all threads for simple counters
+stat.snapshot(['/if/rx', '/if/drops']) - returns per-interface totals summed
+                                  across all threads, for each counter, read
+                                  in one pass under a single lock
+stat.read(['/if/names', '/if/rx']) - returns the counters, all read in one
+                                  consistent lock window. Both read() and
+                                  snapshot() record the epoch and the number
+                                  of retries that were needed
+StatsTotalsCache(stat, ttl).get('/if/rx') - returns the same totals as
+                                  snapshot(), reusing them for ttl seconds
+stat.metrics - counts of lock spins, read retries and failed reads, to gauge
+               contention on the stats segment lock
+
+A VPPStats instance may be shared between threads, its reads and directory
+refreshes are serialized by a re-entrant lock.
 
 Usage:
     stat = VPPStats()
@@ -34,11 +48,16 @@ Usage:
 
 import os
 import socket
+import operator
 import array
 import mmap
 from struct import Struct
 import time
 import re
+import fnmatch
+import functools
+import contextlib
+import threading
 
 
 def recv_fd(sock):
@@ -68,13 +87,33 @@ def get_string(stats, ptr):
     return stats.statseg[namevector : namevector + namevectorlen - 1].decode("ascii")
 
 
+def serialized(method):
+    """Run a VPPStats method holding its re-entrant lock, so that an instance
+    can be shared between threads"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.rlock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class StatsReadError(IOError):
+    """A read that could not be completed within max_retries or timeout"""
+
+
 class StatsVector:
     """A class representing a VPP vector"""
 
+    # Compiled Struct per element format, shared by all vectors
+    structs = {}
+
     def __init__(self, stats, ptr, fmt):
         self.vec_start = ptr - stats.base
         self.vec_len = get_vec_len(stats, ptr - stats.base)
-        self.struct = Struct(fmt)
+        self.struct = self.structs.get(fmt) or self.structs.setdefault(fmt, Struct(fmt))
+        self.fmt = fmt
         self.fmtlen = len(fmt)
         self.elementsize = self.struct.size
         self.statseg = stats.statseg
@@ -91,8 +130,25 @@ class StatsVector:
                 ]
             )
 
+    def view(self):
+        """Zero-copy memoryview over the vector, cast to its element type. A
+        "QQ" vector is returned as a flat "Q" view, so its fields can be read
+        as strided slices. Caller holds the lock, and releases the view."""
+        return memoryview(self.statseg)[
+            self.vec_start : self.vec_start + self.elementsize * self.vec_len
+        ].cast(self.fmt[0])
+
+    def array(self):
+        """Copy the vector into an array with a single memcpy. Caller holds
+        the lock."""
+        values = array.array(self.fmt[0])
+        end = self.vec_start + self.elementsize * self.vec_len
+        with memoryview(self.statseg) as statseg:
+            values.frombytes(statseg[self.vec_start : end])
+        return values
+
     def __getitem__(self, index):
-        if index > self.vec_len:
+        if index >= self.vec_len:
             raise IOError("Index beyond end of vector")
         with self.stats.lock:
             if self.fmtlen == 1:
@@ -111,17 +167,33 @@ class VPPStats:
     shared_headerfmt = Struct("QPQQPP")
     default_socketname = "/run/vpp/stats.sock"
 
-    def __init__(self, socketname=default_socketname, timeout=10):
+    def __init__(self, socketname=default_socketname, timeout=10, max_retries=1000):
         self.socketname = socketname
         self.timeout = timeout
-        self.directory = {}
+        self.max_retries = max_retries
+        self.metrics = {"spins": 0, "retries": 0, "failed_reads": 0}
+        self.last_errors = {}
         self.lock = StatsLock(self)
+        self.rlock = threading.RLock()
         self.connected = False
         self.size = 0
-        self.last_epoch = 0
+        self.base = 0
         self.statseg = 0
+        # Counts directory refreshes, across reconnects, so that anything
+        # derived from the directory can tell whether it is still current
+        self.refreshes = 0
+        self._reset_directory()
 
-    def connect(self):
+    def _reset_directory(self):
+        """Forget the cached directory, which belongs to one stats segment"""
+        self.directory = {}
+        self.directory_by_idx = {}
+        self.directory_raw = b""
+        self.index = StatsPathIndex()
+        self.last_epoch = 0
+
+    @serialized
+    def connect(self, blocking=True):
         """Connect to stats segment"""
         if self.connected:
             return
@@ -140,26 +212,26 @@ class VPPStats:
         self.size = stat_result.st_size
         if self.version != 2:
             raise Exception("Incompatbile stat segment version {}".format(self.version))
+        # The base pointer is fixed for the lifetime of the segment
+        self.base = self.shared_headerfmt.unpack_from(self.statseg)[1]
 
-        self.refresh()
+        self.refresh(blocking)
         self.connected = True
 
+    @serialized
     def disconnect(self):
         """Disconnect from stats segment"""
         if self.connected:
             self.statseg.close()
             self.connected = False
+            # A new segment starts over with its own epochs and directory
+            self._reset_directory()
 
     @property
     def version(self):
         """Get version of stats segment"""
         return self.shared_headerfmt.unpack_from(self.statseg)[0]
 
-    @property
-    def base(self):
-        """Get base pointer of stats segment"""
-        return self.shared_headerfmt.unpack_from(self.statseg)[1]
-
     @property
     def epoch(self):
         """Get current epoch value from stats segment"""
@@ -176,60 +248,188 @@ class VPPStats:
         return self.shared_headerfmt.unpack_from(self.statseg)[4]
 
     elementfmt = "IQ128s"
+    direntryfmt = Struct(elementfmt)
 
+    @serialized
     def refresh(self, blocking=True):
-        """Refresh directory vector cache (epoch changed)"""
-        directory = {}
-        directory_by_idx = {}
+        """Refresh directory vector cache (epoch changed). Only directory slots
+        that changed since the previous refresh are decoded, unchanged slots
+        keep their StatsEntry. Returns lists of the added and removed paths, in
+        directory order."""
+        retries = 0
+        deadline = time.monotonic() + self.timeout
         while True:
             try:
-                with self.lock:
-                    self.last_epoch = self.epoch
-                    for i, direntry in enumerate(
-                        StatsVector(self, self.directory_vector, self.elementfmt)
-                    ):
-                        path_raw = direntry[2].find(b"\x00")
-                        path = direntry[2][:path_raw].decode("ascii")
-                        directory[path] = StatsEntry(direntry[0], direntry[1])
-                        directory_by_idx[i] = path
-                    self.directory = directory
-                    self.directory_by_idx = directory_by_idx
-                    return
-            except IOError:
-                if not blocking:
-                    raise
+                with self.lock.holding(blocking):
+                    epoch = self.epoch
+                    vector = StatsVector(self, self.directory_vector, self.elementfmt)
+                    raw = self.statseg[
+                        vector.vec_start : vector.vec_start
+                        + vector.elementsize * vector.vec_len
+                    ]
+                break
+            except IOError as e:
+                retries = self._retry(e, retries, deadline, blocking)
+
+        added, removed = self._refresh_slots(raw, vector.elementsize)
+        for path in removed:
+            self.index.remove(path)
+        for path in added:
+            self.index.add(path)
+        self.directory_raw = raw
+        self.last_epoch = epoch
+        self.refreshes += 1
+        return added, removed
+
+    def _refresh_slots(self, raw, size):
+        """Apply the changed slots of a raw directory vector to the cache"""
+        old = self.directory_raw
+        changed = []
+        block = size * 64
+        for start in range(0, len(raw), block):
+            if raw[start : start + block] == old[start : start + block]:
+                continue
+            for offset in range(start, min(start + block, len(raw)), size):
+                if raw[offset : offset + size] != old[offset : offset + size]:
+                    changed.append(offset // size)
+        dropped = range(len(raw) // size, len(old) // size)
+
+        # Paths are kept in slot order (in dicts, as ordered sets), so that the
+        # index and everything listed from it is in directory order
+        removed = {}
+        for i in changed + list(dropped):
+            path = self.directory_by_idx.pop(i, None)
+            if path is not None:
+                removed[path] = True
+                del self.directory[path]
+
+        added = {}
+        for i in changed:
+            direntry = self.direntryfmt.unpack_from(raw, i * size)
+            path = direntry[2][: direntry[2].find(b"\x00")].decode("ascii")
+            # Skip empty (deleted) slots, type 5 is STAT_DIR_TYPE_EMPTY
+            if not path or direntry[0] == 5:
+                continue
+            self.directory[path] = StatsEntry(direntry[0], direntry[1])
+            self.directory_by_idx[i] = path
+            added[path] = True
+
+        return (
+            [path for path in added if path not in removed],
+            [path for path in removed if path not in added],
+        )
 
-    def __getitem__(self, item, blocking=True):
+    @serialized
+    def transaction(self, function, blocking=True):
+        """Run function() inside a single lock window. If the optimistic lock
+        fails, the whole function is retried as a unit. Returns a tuple of the
+        function's result, the epoch it was read in, and the number of retries.
+        Non-blocking callers don't connect, which means reading the whole
+        directory, but fail at once if the segment isn't connected."""
         if not self.connected:
+            if not blocking:
+                self.metrics["failed_reads"] += 1
+                raise IOError("Not connected to stats segment")
             self.connect()
+        retries = 0
+        deadline = time.monotonic() + self.timeout
         while True:
             try:
                 if self.last_epoch != self.epoch:
                     self.refresh(blocking)
-                with self.lock:
-                    return self.directory[item].get_counter(self)
-            except IOError:
-                if not blocking:
-                    raise
+                with self.lock.holding(blocking):
+                    epoch = self.lock.epoch
+                    result = function()
+                return result, epoch, retries
+            except StatsReadError:
+                raise
+            except IOError as e:
+                retries = self._retry(e, retries, deadline, blocking)
+
+    def _retry(self, error, retries, deadline, blocking):
+        """Account for a failed read. Raise if it may not be retried, because
+        the caller is non-blocking or because max_retries or the deadline have
+        been reached, otherwise back off and return the new retry count"""
+        if not blocking:
+            self.metrics["failed_reads"] += 1
+            raise error
+        if retries >= self.max_retries or time.monotonic() > deadline:
+            self.metrics["failed_reads"] += 1
+            raise StatsReadError(
+                "Stats segment read failed after %d retries: %s" % (retries, error)
+            )
+        self.metrics["retries"] += 1
+        self.lock.backoff(retries)
+        return retries + 1
+
+    def __getitem__(self, item, blocking=True):
+        return self.transaction(
+            lambda: self.directory[item].get_counter(self), blocking
+        )[0]
 
     def __iter__(self):
         return iter(self.directory.items())
 
+    def read(self, paths, blocking=True):
+        """Return a StatsReadResult of counters for a list of paths, all read
+        in one consistent lock window"""
+
+        def read_paths():
+            return {path: self.directory[path].get_counter(self) for path in paths}
+
+        return StatsReadResult(*self.transaction(read_paths, blocking))
+
+    def snapshot(self, paths, blocking=True, indexes=None):
+        """Return a StatsReadResult of per-interface totals for a list of paths.
+        Each counter vector is read once, in one consistent lock window, and
+        summed across all threads. Simple counters yield a list of ints,
+        combined counters a list of (packets, octets) tuples, other paths (such
+        as /if/names) are returned as-is. If indexes is a sorted list of vector
+        indexes (sw_if_index), only those are summed, and counters yield dicts
+        of the totals by index instead of lists."""
+
+        def read_totals():
+            result = {}
+            for path in paths:
+                entry = self.directory[path]
+                if entry.type in (2, 3):
+                    result[path] = entry.totals(self, indexes)
+                else:
+                    result[path] = entry.get_counter(self)
+            return result
+
+        return StatsReadResult(*self.transaction(read_totals, blocking))
+
+    def error_counters(self, nonzero=True, delta=False, blocking=True):
+        """Return dictionary of /err/ counters, each summed across all threads.
+        All error counters are read in a single locked pass. With nonzero only
+        counters > 0 are returned. With delta the values are the increase since
+        the previous call with delta set (a cleared counter starts over)."""
+
+        def read_errors():
+            result = {}
+            for path in self.index.prefix("/err/"):
+                entry = self.directory[path]
+                if entry.type == 2:
+                    result[path] = entry.sum(self)
+            return result
+
+        totals = self.transaction(read_errors, blocking)[0]
+        result = totals
+        if delta:
+            last = self.last_errors
+            result = {}
+            for path, total in totals.items():
+                previous = last.get(path, 0)
+                result[path] = total - previous if total >= previous else total
+            self.last_errors = totals
+        if nonzero:
+            result = {path: value for path, value in result.items() if value}
+        return result
+
     def set_errors(self, blocking=True):
         """Return dictionary of error counters > 0"""
-        if not self.connected:
-            self.connect()
-
-        errors = {k: v for k, v in self.directory.items() if k.startswith("/err/")}
-        result = {}
-        for k in errors:
-            try:
-                total = self[k].sum()
-                if total:
-                    result[k] = total
-            except KeyError:
-                pass
-        return result
+        return self.error_counters(blocking=blocking)
 
     def set_errors_str(self, blocking=True):
         """Return all errors counters > 0 pretty printed"""
@@ -244,8 +444,8 @@ class VPPStats:
         return self.__getitem__(name, blocking)
 
     def get_err_counter(self, name, blocking=True):
-        """Alternative call to __getitem__"""
-        return self.__getitem__(name, blocking).sum()
+        """Return an error counter summed across all threads"""
+        return self.transaction(lambda: self.directory[name].sum(self), blocking)[0]
 
     def ls(self, patterns):
         """Returns list of counters matching pattern"""
@@ -254,15 +454,32 @@ class VPPStats:
             self.connect()
         if not isinstance(patterns, list):
             patterns = [patterns]
-        regex = [re.compile(i) for i in patterns]
         if self.last_epoch != self.epoch:
             self.refresh()
 
-        return [
-            k
-            for k, v in self.directory.items()
-            if any(re.match(pattern, k) for pattern in regex)
-        ]
+        result = {}
+        for pattern in patterns:
+            regex = re.compile(pattern)
+            for k in self.index.prefix(regex_prefix(pattern)):
+                if regex.match(k):
+                    result[k] = True
+        return list(result)
+
+    def glob(self, patterns):
+        """Returns list of counters matching a shell-style pattern, in which
+        wildcards match within one path component, eg. /interfaces/*/rx"""
+        if not self.connected:
+            self.connect()
+        if not isinstance(patterns, list):
+            patterns = [patterns]
+        if self.last_epoch != self.epoch:
+            self.refresh()
+
+        result = {}
+        for pattern in patterns:
+            for k in self.index.glob(pattern):
+                result[k] = True
+        return list(result)
 
     def dump(self, counters, blocking=True):
         """Given a list of counters return a dictionary of results"""
@@ -274,41 +491,217 @@ class VPPStats:
         return result
 
 
+def regex_prefix(pattern):
+    """Return the literal prefix that every match of a regex must start with"""
+    if "|" in pattern:
+        return ""
+    prefix = []
+    for char in pattern[1:] if pattern.startswith("^") else pattern:
+        if char in "*?{":
+            # The preceding character is optional or repeated
+            return "".join(prefix[:-1])
+        if char in ".^$+[]\\()":
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+class StatsPathIndex:
+    """Index of stats paths, as a trie over their "/" separated components,
+    so that prefix and glob lookups cost about the size of the answer"""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, path):
+        """Add a path to the index"""
+        node = self.root
+        for part in path.split("/"):
+            node = node.setdefault(part, {})
+        node[None] = path
+
+    def remove(self, path):
+        """Remove a path from the index, pruning empty branches"""
+        parents = []
+        node = self.root
+        for part in path.split("/"):
+            parents.append((node, part))
+            node = node.get(part)
+            if node is None:
+                return
+        node.pop(None, None)
+        for parent, part in reversed(parents):
+            if parent[part]:
+                break
+            del parent[part]
+
+    def walk(self, node):
+        """Yield all paths at and below a node, in the order they were added"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if None in node:
+                yield node[None]
+            stack.extend(
+                child for part, child in reversed(node.items()) if part is not None
+            )
+
+    def prefix(self, prefix):
+        """Return the list of paths that start with prefix"""
+        parts = prefix.split("/")
+        node = self.root
+        for part in parts[:-1]:
+            node = node.get(part)
+            if node is None:
+                return []
+        result = []
+        for part, child in node.items():
+            if part is not None and part.startswith(parts[-1]):
+                result.extend(self.walk(child))
+        return result
+
+    def glob(self, pattern):
+        """Return the list of paths matching a shell-style pattern, component
+        by component"""
+        nodes = [self.root]
+        for part in pattern.split("/"):
+            if not any(char in part for char in "*?["):
+                nodes = [node[part] for node in nodes if part in node]
+                continue
+            nodes = [
+                child
+                for node in nodes
+                for name, child in node.items()
+                if name is not None and fnmatch.fnmatchcase(name, part)
+            ]
+        return [node[None] for node in nodes if None in node]
+
+
+class StatsReadResult(dict):
+    """Counters keyed by path, read together in one lock window"""
+
+    def __init__(self, counters, epoch, retries):
+        super().__init__(counters)
+        self.epoch = epoch
+        self.retries = retries
+
+
+class StatsTotalsCache:
+    """Per-interface totals of counter vectors, read on demand and reused for
+    ttl seconds. If a read fails, the previous totals are returned instead."""
+
+    def __init__(self, stats, ttl):
+        self.stats = stats
+        self.ttl = ttl
+        self.cache = {}
+
+    def clear(self):
+        """Forget all cached totals, eg. after reconnecting to VPP"""
+        self.cache = {}
+
+    def get(self, path, blocking=True):
+        """Return the totals of a counter vector, reading it if it is stale.
+        Unless blocking, a read that would have to wait for another thread or
+        for a stats segment update fails at once, as if it had failed."""
+        now = time.monotonic()
+        cached = self.cache.get(path)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+        try:
+            if not self.stats.rlock.acquire(blocking):
+                raise IOError("Stats segment is in use by another thread")
+            try:
+                totals = self.stats.snapshot([path], blocking)[path]
+            finally:
+                self.stats.rlock.release()
+        except IOError:
+            if cached:
+                return cached[1]
+            raise
+        self.cache[path] = (now, totals)
+        return totals
+
+
 class StatsLock:
     """Stat segment optimistic locking"""
 
+    # Busy-poll in_progress this many times before starting to sleep, then
+    # back off exponentially from backoff_min up to backoff_max seconds.
+    spin_limit = 16
+    backoff_min = 0.00005
+    backoff_max = 0.01
+
     def __init__(self, stats):
         self.stats = stats
         self.epoch = 0
+        self.depth = 0
 
     def __enter__(self):
-        acquired = self.acquire(blocking=True)
-        assert acquired, "Lock wasn't acquired, but blocking=True"
+        self.enter()
         return self
 
     def __exit__(self, exc_type=None, exc_value=None, traceback=None):
         self.release()
 
+    def enter(self, blocking=True):
+        """Acquire the lock, waiting for at most the stats timeout if blocking,
+        or not at all otherwise. Raise IOError if it can't be acquired."""
+        if not self.acquire(blocking=blocking, timeout=self.stats.timeout):
+            if not blocking:
+                raise IOError("Stats segment update in progress")
+            raise IOError("Timed out waiting for stats segment update to finish")
+
+    @contextlib.contextmanager
+    def holding(self, blocking=True):
+        """Context manager like the lock itself, which honours blocking"""
+        self.enter(blocking)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def backoff(self, attempt):
+        """Spin for the first attempts, then sleep for an exponentially
+        growing interval"""
+        if attempt < self.spin_limit:
+            return
+        time.sleep(
+            min(self.backoff_max, self.backoff_min * 2 ** (attempt - self.spin_limit))
+        )
+
     def acquire(self, blocking=True, timeout=-1):
-        """Acquire the lock. Await in progress to go false. Record epoch."""
-        self.epoch = self.stats.epoch
+        """Acquire the lock. Await in progress to go false, for at most timeout
+        seconds if it is positive. Record epoch. Nested acquires share the
+        epoch of the outermost one."""
+        if self.depth:
+            self.depth += 1
+            return True
         if timeout > 0:
-            start = time.monotonic()
+            deadline = time.monotonic() + timeout
+        attempt = 0
         while self.stats.in_progress:
             if not blocking:
-                time.sleep(0.01)
-                if timeout > 0:
-                    if start + time.monotonic() > timeout:
-                        return False
+                return False
+            if timeout > 0 and time.monotonic() > deadline:
+                return False
+            self.stats.metrics["spins"] += 1
+            self.backoff(attempt)
+            attempt += 1
+        self.epoch = self.stats.epoch
+        self.depth = 1
         return True
 
     def release(self):
         """Check if data read while locked is valid"""
+        self.depth -= 1
+        if self.depth:
+            return
         if self.stats.in_progress or self.stats.epoch != self.epoch:
             raise IOError("Optimistic lock failed, retry")
 
     def locked(self):
-        """Not used"""
+        """Return True if the lock is held"""
+        return self.depth > 0
 
 
 class StatsCombinedList(list):
@@ -341,12 +734,61 @@ class CombinedList(list):
         return sum(self.octets())
 
 
+class StatsCombinedRow:
+    """Combined counters of one thread, backed by a flat array of packets and
+    octets. Packets and octets are exposed as strided views of that array."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StatsCombinedRow index out of range")
+        return StatsTuple((self.values[2 * index], self.values[2 * index + 1]))
+
+    def __iter__(self):
+        values = self.values
+        for i in range(0, len(values), 2):
+            yield StatsTuple((values[i], values[i + 1]))
+
+    def __eq__(self, other):
+        if isinstance(other, StatsCombinedRow):
+            return self.values == other.values
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return list.__repr__(list(self))
+
+    def packets(self):
+        """Return packets for all indexes, as a zero-copy view"""
+        return memoryview(self.values)[0::2]
+
+    def octets(self):
+        """Return octets for all indexes, as a zero-copy view"""
+        return memoryview(self.values)[1::2]
+
+
 class StatsTuple(tuple):
     """A Combined vector tuple (packets, octets)"""
 
-    def __init__(self, data):
-        self.dictionary = {"packets": data[0], "bytes": data[1]}
-        super().__init__()
+    __slots__ = ()
+
+    @property
+    def dictionary(self):
+        """The tuple as a dictionary of packets and bytes"""
+        return {
+            "packets": tuple.__getitem__(self, 0),
+            "bytes": tuple.__getitem__(self, 1),
+        }
 
     def __repr__(self):
         return dict.__repr__(self.dictionary)
@@ -385,6 +827,8 @@ class StatsEntry:
     def __init__(self, stattype, statvalue):
         self.type = stattype
         self.value = statvalue
+        self.target = None
+        self.target_refresh = None
 
         if stattype == 1:
             self.function = self.scalar
@@ -410,36 +854,151 @@ class StatsEntry:
     def simple(self, stats):
         """Simple counter"""
         counter = StatsSimpleList()
-        for threads in StatsVector(stats, self.value, "P"):
-            clist = [v[0] for v in StatsVector(stats, threads[0], "Q")]
-            counter.append(clist)
+        with StatsVector(stats, self.value, "P").view() as threads:
+            for thread in threads:
+                counter.append(StatsVector(stats, thread, "Q").array().tolist())
         return counter
 
     def combined(self, stats):
         """Combined counter"""
         counter = StatsCombinedList()
-        for threads in StatsVector(stats, self.value, "P"):
-            clist = [StatsTuple(cnt) for cnt in StatsVector(stats, threads[0], "QQ")]
-            counter.append(clist)
+        with StatsVector(stats, self.value, "P").view() as threads:
+            for thread in threads:
+                row = StatsVector(stats, thread, "QQ").array()
+                counter.append(StatsCombinedRow(row))
         return counter
 
+    def simple_totals(self, stats):
+        """Simple counter, summed across threads"""
+        totals = []
+        with StatsVector(stats, self.value, "P").view() as threads:
+            for thread in threads:
+                with StatsVector(stats, thread, "Q").view() as row:
+                    if totals:
+                        totals = list(map(operator.add, totals, row))
+                    else:
+                        totals = row.tolist()
+        return totals
+
+    def combined_totals(self, stats):
+        """Combined counter, summed across threads"""
+        packets = []
+        octets = []
+        with StatsVector(stats, self.value, "P").view() as threads:
+            for thread in threads:
+                with StatsVector(stats, thread, "QQ").view() as row:
+                    if packets:
+                        packets = list(map(operator.add, packets, row[0::2]))
+                        octets = list(map(operator.add, octets, row[1::2]))
+                    else:
+                        packets = row[0::2].tolist()
+                        octets = row[1::2].tolist()
+        return list(zip(packets, octets))
+
+    def sum(self, stats):
+        """Simple counter, summed across all indexes and threads"""
+        total = 0
+        base = stats.base
+        with memoryview(stats.statseg) as statseg:
+            with StatsVector(stats, self.value, "P").view() as threads:
+                for thread in threads:
+                    start = thread - base
+                    end = start + 8 * get_vec_len(stats, start)
+                    if end >= stats.size:
+                        raise IOError("Vector overruns stats segment")
+                    total += sum(statseg[start:end].cast("Q"))
+        return total
+
+    def indexed_totals(self, stats, indexes):
+        """Counter vector, summed across threads for the given sorted indexes
+        only, as a dict by index of ints (simple) or (packets, octets) tuples
+        (combined)"""
+        columns = 2 if self.type == 3 else 1
+        totals = None
+        with StatsVector(stats, self.value, "P").view() as threads:
+            for thread in threads:
+                with StatsVector(stats, thread, "Q" * columns).view() as row:
+                    count = len(row) // columns
+                    if indexes and indexes[-1] >= count:
+                        indexes = [i for i in indexes if i < count]
+                    if not indexes:
+                        break
+                    # itemgetter gathers all indexes in C, as a tuple (unless
+                    # there's just one)
+                    get = operator.itemgetter(*indexes)
+                    values = []
+                    for column in range(columns):
+                        column_values = get(row[column::columns])
+                        if len(indexes) == 1:
+                            column_values = (column_values,)
+                        values.append(column_values)
+                    if totals:
+                        totals = [
+                            list(map(operator.add, total, value))
+                            for total, value in zip(totals, values)
+                        ]
+                    else:
+                        totals = values
+        if not totals or not indexes:
+            return {}
+        if columns == 1:
+            return dict(zip(indexes, totals[0]))
+        return dict(zip(indexes, zip(*totals)))
+
+    def totals(self, stats, indexes=None):
+        """Return per-index totals of a counter vector, summed across threads,
+        for all indexes, or only for the given sorted indexes"""
+        if self.type not in (2, 3):
+            raise ValueError("Not a counter vector")
+        if indexes is not None:
+            return self.indexed_totals(stats, indexes)
+        if self.type == 2:
+            return self.simple_totals(stats)
+        return self.combined_totals(stats)
+
     def name(self, stats):
-        """Name counter"""
+        """Name vector, with None for unused slots so that positions match
+        the vector index (the sw_if_index, for /if/names)"""
         counter = []
-        for name in StatsVector(stats, self.value, "P"):
-            if name[0]:
-                counter.append(get_string(stats, name[0]))
+        with StatsVector(stats, self.value, "P").view() as names:
+            for name in names:
+                counter.append(get_string(stats, name) if name else None)
         return counter
 
     SYMLINK_FMT1 = Struct("II")
     SYMLINK_FMT2 = Struct("Q")
 
+    def resolve(self, stats):
+        """Resolve a symlink to its target entry and index, once per directory
+        refresh"""
+        if self.target_refresh != stats.refreshes:
+            b = self.SYMLINK_FMT2.pack(self.value)
+            index1, index2 = self.SYMLINK_FMT1.unpack(b)
+            self.target = (stats.directory[stats.directory_by_idx[index1]], index2)
+            self.target_refresh = stats.refreshes
+        return self.target
+
+    def column(self, stats, index):
+        """Counter of a single index on all threads, without reading the rest
+        of the counter vector"""
+        if self.type == 2:
+            column = SimpleList()
+            with StatsVector(stats, self.value, "P").view() as threads:
+                for thread in threads:
+                    column.append(StatsVector(stats, thread, "Q")[index])
+            return column
+        if self.type == 3:
+            column = CombinedList()
+            with StatsVector(stats, self.value, "P").view() as threads:
+                for thread in threads:
+                    column.append(StatsTuple(StatsVector(stats, thread, "QQ")[index]))
+            return column
+        raise ValueError("Not a counter vector")
+
     def symlink(self, stats):
         """Symlink counter"""
-        b = self.SYMLINK_FMT2.pack(self.value)
-        index1, index2 = self.SYMLINK_FMT1.unpack(b)
-        name = stats.directory_by_idx[index1]
-        return stats[name][:, index2]
+        entry, index = self.resolve(stats)
+        return entry.column(stats, index)
 
     def get_counter(self, stats):
         """Return a list of counters"""
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VPPStatsServer builds a synthetic version 2 VPP statistics segment in a memfd
+and serves it on a unix socket using the same file descriptor passing protocol
+as VPP's /run/vpp/stats.sock, so that VPPStats (and the agent) can be tested
+and benchmarked without a running VPP.
+
+The segment contains:
+    /if/names                          - name vector
+    /if/rx, /if/tx, ...                - combined counters (packets, octets)
+    /if/drops, /if/rx-error, ...       - simple counters
+    /err/synthetic-node/error-N        - simple error counters
+    /interfaces/<name>/<counter>       - symlinks to the interface counters
+    /sys/num_worker_threads, ...       - scalars
+
+Usage:
+    server = VPPStatsServer("/tmp/stats.sock", interfaces=10000, threads=32)
+    server.start(mutate_interval=1.0)
+    stat = VPPStats(socketname="/tmp/stats.sock")
+    stat.connect()
+    ...
+    server.stop()
+
+Or from the command line, optionally running a VPPStats benchmark (-b):
+    ./vppstats_server.py -s /tmp/stats.sock -i 10000 -t 32 -m 1 -b
+"""
+
+import os
+import sys
+import mmap
+import array
+import socket
+import struct
+import threading
+import time
+import logging
+import agentx
+
+try:
+    import argparse
+except ImportError:
+    print("ERROR: install argparse manually: sudo pip install argparse")
+    sys.exit(2)
+
+
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+
+logger = logging.getLogger("agentx.vppstats_server")
+logger.addHandler(NullHandler())
+
+
+STAT_DIR_TYPE_SCALAR_INDEX = 1
+STAT_DIR_TYPE_COUNTER_VECTOR_SIMPLE = 2
+STAT_DIR_TYPE_COUNTER_VECTOR_COMBINED = 3
+STAT_DIR_TYPE_NAME_VECTOR = 4
+STAT_DIR_TYPE_SYMLINK = 6
+
+SIMPLE_COUNTERS = [
+    "/if/drops",
+    "/if/rx-no-buf",
+    "/if/rx-miss",
+    "/if/rx-error",
+    "/if/tx-error",
+]
+COMBINED_COUNTERS = [
+    "/if/rx",
+    "/if/rx-unicast",
+    "/if/rx-multicast",
+    "/if/rx-broadcast",
+    "/if/tx",
+    "/if/tx-unicast",
+    "/if/tx-multicast",
+    "/if/tx-broadcast",
+]
+
+HEADER_FMT = struct.Struct("QPQQPP")
+DIRENTRY_FMT = struct.Struct("IQ128s")
+SYMLINK_FMT = struct.Struct("II")
+VEC_HEADER_SIZE = 8
+
+
+class StatSegmentImage:
+    """Lays out a version 2 stats segment in a writable buffer"""
+
+    # pylint: disable=too-many-instance-attributes
+    base = 0x7F0000000000
+
+    def __init__(self, buf, size):
+        self.buf = buf
+        self.size = size
+        self.offset = HEADER_FMT.size
+
+    def alloc(self, nbytes):
+        """Allocate nbytes, 16-byte aligned, and return the offset"""
+        offset = (self.offset + 15) & ~15
+        if offset + nbytes >= self.size:
+            raise MemoryError("Stats segment too small")
+        self.offset = offset + nbytes
+        return offset
+
+    def vec(self, nelem, elemsize):
+        """Allocate a VPP vector of nelem elements and return its data offset"""
+        offset = self.alloc(VEC_HEADER_SIZE + nelem * elemsize) + VEC_HEADER_SIZE
+        struct.pack_into("I", self.buf, offset - VEC_HEADER_SIZE, nelem)
+        return offset
+
+    def ptr(self, offset):
+        """Convert a segment offset to a pointer as seen by VPP"""
+        return self.base + offset
+
+    def string(self, value):
+        """Allocate a NUL terminated string vector"""
+        raw = value.encode("ascii") + b"\x00"
+        offset = self.vec(len(raw), 1)
+        self.buf[offset : offset + len(raw)] = raw
+        return offset
+
+    def counter(self, threads, nelem, elemsize):
+        """Allocate a per-thread counter vector, return (vector, [thread rows])"""
+        vector = self.vec(threads, 8)
+        rows = []
+        for thread in range(threads):
+            row = self.vec(nelem, elemsize)
+            struct.pack_into("P", self.buf, vector + thread * 8, self.ptr(row))
+            rows.append(row)
+        return vector, rows
+
+
+class VPPStatsServer:
+    """Serve a synthetic stats segment over a unix SEQPACKET socket"""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        socketname="/tmp/stats.sock",
+        interfaces=16,
+        threads=2,
+        errors=64,
+        symlinks=True,
+    ):
+        self.socketname = socketname
+        self.interfaces = interfaces
+        self.threads = threads
+        self.errors = errors
+        self.symlinks = symlinks
+        self.ifnames = ["synth%d" % i for i in range(interfaces)]
+
+        self.rows = {}
+        self.directory = []
+        self.epoch = 1
+        self.generation = 0
+        self.size = self._estimate_size()
+        self.fd = os.memfd_create("vpp-stats-synthetic")
+        os.ftruncate(self.fd, self.size)
+        self.statseg = mmap.mmap(self.fd, self.size, mmap.MAP_SHARED)
+        self.image = StatSegmentImage(self.statseg, self.size)
+        self._build()
+
+        self._sock = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _estimate_size(self):
+        per_thread = self.interfaces * 16 + 64
+        counters = (len(SIMPLE_COUNTERS) + len(COMBINED_COUNTERS)) * (
+            self.threads * (per_thread + 8) + 64
+        )
+        errors = self.errors * (self.threads * 32 + 64)
+        names = self.interfaces * 96
+        entries = 8 + self.errors + len(SIMPLE_COUNTERS) + len(COMBINED_COUNTERS)
+        if self.symlinks:
+            entries += self.interfaces * (len(SIMPLE_COUNTERS) + len(COMBINED_COUNTERS))
+        directory = entries * (DIRENTRY_FMT.size + 16)
+        size = counters + errors + names + directory + (1 << 20)
+        return (size + mmap.PAGESIZE - 1) & ~(mmap.PAGESIZE - 1)
+
+    def _entry(self, stattype, value, name):
+        self.directory.append((stattype, value, name))
+        return len(self.directory) - 1
+
+    def _build(self):
+        image = self.image
+        self._entry(
+            STAT_DIR_TYPE_SCALAR_INDEX, self.threads - 1, "/sys/num_worker_threads"
+        )
+
+        names = image.vec(self.interfaces, 8)
+        for i, ifname in enumerate(self.ifnames):
+            name = image.ptr(image.string(ifname))
+            struct.pack_into("P", image.buf, names + i * 8, name)
+        self._entry(STAT_DIR_TYPE_NAME_VECTOR, image.ptr(names), "/if/names")
+
+        counter_idx = {}
+        for path in SIMPLE_COUNTERS:
+            vector, rows = image.counter(self.threads, self.interfaces, 8)
+            self.rows[path] = (rows, self.interfaces, False)
+            counter_idx[path] = self._entry(
+                STAT_DIR_TYPE_COUNTER_VECTOR_SIMPLE, image.ptr(vector), path
+            )
+        for path in COMBINED_COUNTERS:
+            vector, rows = image.counter(self.threads, self.interfaces, 16)
+            self.rows[path] = (rows, self.interfaces * 2, True)
+            counter_idx[path] = self._entry(
+                STAT_DIR_TYPE_COUNTER_VECTOR_COMBINED, image.ptr(vector), path
+            )
+
+        for i in range(self.errors):
+            path = "/err/synthetic-node/error-%d" % i
+            vector, rows = image.counter(self.threads, 1, 8)
+            self.rows[path] = (rows, 1, False)
+            self._entry(STAT_DIR_TYPE_COUNTER_VECTOR_SIMPLE, image.ptr(vector), path)
+
+        if self.symlinks:
+            for i, ifname in enumerate(self.ifnames):
+                for path, idx in counter_idx.items():
+                    value = struct.unpack("Q", SYMLINK_FMT.pack(idx, i))[0]
+                    name = "/interfaces/%s/%s" % (ifname, path[len("/if/") :])
+                    self._entry(STAT_DIR_TYPE_SYMLINK, value, name)
+
+        self.directory_offset = image.vec(len(self.directory), DIRENTRY_FMT.size)
+        for i, (stattype, value, name) in enumerate(self.directory):
+            DIRENTRY_FMT.pack_into(
+                image.buf,
+                self.directory_offset + i * DIRENTRY_FMT.size,
+                stattype,
+                value,
+                name.encode("ascii"),
+            )
+        self._set_header(0)
+
+    def _set_header(self, in_progress):
+        HEADER_FMT.pack_into(
+            self.statseg,
+            0,
+            2,
+            self.image.base,
+            self.epoch,
+            in_progress,
+            self.image.ptr(self.directory_offset),
+            0,
+        )
+
+    def mutate(self, step=1, bump_epoch=False):
+        """Advance every counter by step packets, and every combined counter
+        also by 64 octets per packet. Counters are written without in_progress,
+        as VPP's workers do. With bump_epoch, the epoch is then bumped under
+        in_progress, as VPP does when it changes the directory."""
+        self.generation += step
+        word = struct.pack("Q", self.generation)
+        pair = struct.pack("QQ", self.generation, self.generation * 64)
+        patterns = {}
+        for rows, nwords, combined in self.rows.values():
+            key = (nwords, combined)
+            if key not in patterns:
+                if combined:
+                    patterns[key] = pair * (nwords // 2)
+                else:
+                    patterns[key] = word * nwords
+            for row in rows:
+                self.statseg[row : row + nwords * 8] = patterns[key]
+        if bump_epoch:
+            self._set_header(1)
+            self.epoch += 1
+            self._set_header(0)
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            fds = array.array("i", [self.fd])
+            with conn:
+                conn.sendmsg([b"\x00"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+
+    def _mutator(self, interval, bump_epoch):
+        while not self._stop.wait(interval):
+            self.mutate(bump_epoch=bump_epoch)
+
+    def start(self, mutate_interval=0, bump_epoch=False):
+        """Start serving, and mutate counters every mutate_interval seconds"""
+        if os.path.exists(self.socketname):
+            os.unlink(self.socketname)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._sock.bind(self.socketname)
+        self._sock.listen(16)
+        self._sock.settimeout(0.1)
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._serve, daemon=True)]
+        if mutate_interval:
+            mutator = threading.Thread(
+                target=self._mutator, args=(mutate_interval, bump_epoch), daemon=True
+            )
+            self._threads.append(mutator)
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            "Serving %d bytes statseg on %s (%d interfaces, %d threads, %d errors)"
+            % (self.size, self.socketname, self.interfaces, self.threads, self.errors)
+        )
+
+    def stop(self):
+        """Stop serving and remove the socket"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self.socketname):
+            os.unlink(self.socketname)
+
+    def close(self):
+        """Stop serving and release the memfd"""
+        self.stop()
+        self.statseg.close()
+        os.close(self.fd)
+
+
+def benchmark(socketname, symlinks=1000):
+    """Time the VPPStats read paths against the segment served on socketname"""
+    # pylint: disable=import-outside-toplevel
+    from vppstats import VPPStats
+
+    def timed(name, function):
+        start = time.monotonic()
+        result = function()
+        print("%-40s %10.2f ms" % (name, (time.monotonic() - start) * 1000))
+        return result
+
+    stat = VPPStats(socketname=socketname)
+    timed("connect (full directory refresh)", stat.connect)
+    print("%-40s %10d" % ("directory entries", len(stat.directory)))
+    timed("refresh (unchanged directory)", stat.refresh)
+    ifnames = timed("read /if/names", lambda: stat["/if/names"])
+    timed("read /if/rx (all threads, all ifaces)", lambda: stat["/if/rx"])
+    timed(
+        "snapshot of 10 interface counters",
+        lambda: stat.snapshot(
+            [
+                "/if/names",
+                "/if/rx",
+                "/if/rx-multicast",
+                "/if/rx-broadcast",
+                "/if/rx-no-buf",
+                "/if/rx-error",
+                "/if/tx",
+                "/if/tx-multicast",
+                "/if/tx-broadcast",
+                "/if/drops",
+                "/if/tx-error",
+            ]
+        ),
+    )
+    timed("error_counters", lambda: stat.error_counters(nonzero=False))
+    timed("ls('/err/')", lambda: stat.ls("/err/"))
+    names = ifnames[:symlinks]
+    timed(
+        "%d /interfaces/<name>/rx symlinks" % len(names),
+        lambda: [stat["/interfaces/%s/rx" % name] for name in names],
+    )
+    print("%-40s %10s" % ("lock metrics", stat.metrics))
+    stat.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "-s",
+        dest="socketname",
+        default="/tmp/stats.sock",
+        type=str,
+        help="""Location of the stats socket to serve, default /tmp/stats.sock""",
+    )
+    parser.add_argument(
+        "-i",
+        dest="interfaces",
+        type=int,
+        default=16,
+        help="""Number of interfaces, default 16""",
+    )
+    parser.add_argument(
+        "-t",
+        dest="threads",
+        type=int,
+        default=2,
+        help="""Number of threads (main and workers), default 2""",
+    )
+    parser.add_argument(
+        "-e",
+        dest="errors",
+        type=int,
+        default=64,
+        help="""Number of /err/ counters, default 64""",
+    )
+    parser.add_argument(
+        "-m",
+        dest="mutate",
+        type=float,
+        default=0,
+        help="""Mutate counters every MUTATE seconds, default 0 (never)""",
+    )
+    parser.add_argument(
+        "-E",
+        dest="bump_epoch",
+        action="store_true",
+        help="""Bump the epoch on every mutation, default False""",
+    )
+    parser.add_argument(
+        "-b",
+        dest="benchmark",
+        action="store_true",
+        help="""Run a VPPStats benchmark against the segment and exit, default False""",
+    )
+    parser.add_argument(
+        "-d", dest="debug", action="store_true", help="""Enable debug, default False"""
+    )
+
+    args = parser.parse_args()
+    agentx.setup_logging(debug=args.debug)
+
+    server = VPPStatsServer(
+        socketname=args.socketname,
+        interfaces=args.interfaces,
+        threads=args.threads,
+        errors=args.errors,
+    )
+    server.start(mutate_interval=args.mutate, bump_epoch=args.bump_epoch)
+    try:
+        if args.benchmark:
+            benchmark(args.socketname)
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    server.close()
+
+
+if __name__ == "__main__":
+    main()